@@ -0,0 +1,209 @@
+import argparse
+import collections
+import datetime
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+import psycopg2
+from dotenv import dotenv_values
+from psycopg2.pool import ThreadedConnectionPool
+
+import bloodbank
+import bloodbank.seed
+from bloodbank import FetchMode
+from bloodbank.user import User, Command
+
+DEFAULT_MIX: str = 'VIEW_APPOINTMENTS=70,S_CREATE_APPOINTMENT=15,S_VIEW_ANNOUNCEMENTS=10,AUTHENTICATE=5'
+STAFF_ONLY: tuple = (Command.S_CREATE_APPOINTMENT, Command.S_VIEW_ANNOUNCEMENTS)
+
+
+class Feed:
+    def __init__(self):
+        self._lines: collections.deque = collections.deque()
+
+    def reset(self, *lines: str):
+        self._lines = collections.deque(f'{line}\n' for line in lines)
+
+    def readline(self) -> str:
+        return self._lines.popleft() if self._lines else ''
+
+
+def parse_mix(spec: str) -> dict[Command, int]:
+    return {Command[name.strip()]: int(weight) for name, weight in (part.split('=') for part in spec.split(','))}
+
+
+def script(command: Command, creds, rng: random.Random, patients: list[int]) -> tuple:
+    if command == Command.AUTHENTICATE:
+        return Command.AUTHENTICATE.value, f'{creds.email} {creds.password}'
+    if command == Command.VIEW_APPOINTMENTS:
+        return Command.VIEW_APPOINTMENTS.value[0], 'n'
+    if command == Command.S_VIEW_ANNOUNCEMENTS:
+        return Command.S_VIEW_ANNOUNCEMENTS.value, 'n'
+    if command == Command.S_CREATE_APPOINTMENT:
+        when = datetime.datetime(2030, 1, 1) + datetime.timedelta(minutes=30 * rng.randrange(500000))
+        return (
+            Command.S_CREATE_APPOINTMENT.value, 'Blood test', 'Benchmark',
+            f'{rng.choice(patients)} {rng.randint(1, 40)}', when.strftime('%d-%m-%Y %H:%M')
+        )
+    raise ValueError(f'No script for {command.name}')
+
+
+def client(terminal, creds, mix: dict, operations: int, warmup: int, seed: int, patients: list[int], results: list):
+    rng = random.Random(seed)
+    feed = Feed()
+    user = User(terminal, istream=feed, ostream=open(os.devnull, 'w'), columns=81)
+    allowed = {c: w for c, w in mix.items() if creds.kind == 'staff' or c not in STAFF_ONLY}
+    commands, weights = list(allowed), list(allowed.values())
+
+    feed.reset(*script(Command.AUTHENTICATE, creds, rng, patients))
+    user.interact()
+
+    for i in range(warmup + operations):
+        command = rng.choices(commands, weights)[0]
+        feed.reset(*script(command, creds, rng, patients))
+
+        start = time.perf_counter()
+        try:
+            user.interact()
+            ok = True
+        except (PermissionError, ValueError, EOFError, psycopg2.Error):
+            ok = False
+        elapsed = time.perf_counter() - start
+
+        if i >= warmup:
+            results.append((command.name, elapsed, ok, start))
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def summarize(results: list) -> dict:
+    # Throughput is measured over the window in which measured commands ran, excluding warmup
+    wall = max(start + elapsed for _, elapsed, _, start in results) - min(start for *_, start in results)
+    by_command = collections.defaultdict(list)
+    for name, elapsed, ok, _ in results:
+        by_command[name].append((elapsed, ok))
+
+    summary = {}
+    for name, samples in sorted(by_command.items()):
+        latencies = [elapsed for elapsed, _ in samples]
+        summary[name] = {
+            'count': len(samples),
+            'errors': sum(1 for _, ok in samples if not ok),
+            'throughput': len(samples) / wall,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+        }
+
+    summary['TOTAL'] = {
+        'count': len(results),
+        'errors': sum(1 for _, _, ok, _ in results if not ok),
+        'throughput': len(results) / wall,
+        'p50_ms': percentile([r[1] for r in results], 0.50) * 1000,
+        'p95_ms': percentile([r[1] for r in results], 0.95) * 1000,
+        'p99_ms': percentile([r[1] for r in results], 0.99) * 1000,
+    }
+    return summary
+
+
+def regressions(summary: dict, baseline: dict, tolerance: float) -> list[str]:
+    found = []
+    for name, base in baseline['commands'].items():
+        current = summary.get(name)
+        if current is None:
+            continue
+        if current['throughput'] < base['throughput'] * (1 - tolerance):
+            found.append(f"{name}: throughput {current['throughput']:.1f}/s < baseline {base['throughput']:.1f}/s")
+        for key in ('p95_ms', 'p99_ms'):
+            if current[key] > base[key] * (1 + tolerance):
+                found.append(f"{name}: {key} {current[key]:.2f} > baseline {base[key]:.2f}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Drive bloodbank.user.User with concurrent scripted sessions')
+    parser.add_argument('--staff', type=int, default=4, help='concurrent staff sessions')
+    parser.add_argument('--patients', type=int, default=4, help='concurrent patient sessions')
+    parser.add_argument('--operations', type=int, default=500, help='measured commands per session')
+    parser.add_argument('--warmup', type=int, default=50, help='unmeasured commands per session')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='comma separated COMMAND=weight pairs')
+    parser.add_argument('--scale', type=float, help='reseed the database at this scale factor before the run')
+    parser.add_argument('--output', help='write the results as JSON to this path')
+    parser.add_argument('--baseline', help='fail if results regress against this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    args = parser.parse_args()
+
+    config: dict = dotenv_values('.env')
+    sessions = args.staff + args.patients
+    pool = ThreadedConnectionPool(
+        1, max(1, sessions),
+        dbname=config.get('DB_NAME'),
+        user=config.get('USER'),
+        password=config.get('PASSWORD'),
+        connection_factory=bloodbank.Connection
+    )
+    terminal = bloodbank.Terminal(pool)
+
+    with terminal.session() as connection:
+        if args.scale is not None:
+            bloodbank.seed.seed(connection, bloodbank.seed.Dataset(args.scale))
+
+        staff = terminal.execute_query(
+            "SELECT 'staff' AS kind, email, password FROM staff WHERE status = 'Doctor' ORDER BY random() LIMIT %s",
+            FetchMode.ALL, args.staff
+        )
+        patients = terminal.execute_query(
+            "SELECT 'patient' AS kind, email, password, patient_id FROM patient ORDER BY random() LIMIT %s",
+            FetchMode.ALL, max(args.patients, 100)
+        )
+
+    mix = parse_mix(args.mix)
+    patient_ids = [p.patient_id for p in patients]
+    results: list = []
+    threads = [
+        threading.Thread(target=client, args=(
+            terminal, creds, mix, args.operations, args.warmup, i, patient_ids, results
+        ))
+        for i, creds in enumerate(list(staff) + list(patients[:args.patients]))
+    ]
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    pool.closeall()
+
+    summary = summarize(results)
+    report = {
+        'config': {'staff': args.staff, 'patients': args.patients, 'operations': args.operations, 'mix': args.mix,
+                   'scale': args.scale},
+        'commands': summary,
+    }
+
+    print(f"{'command':<24}{'count':>8}{'errors':>8}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, row in summary.items():
+        print(f"{name:<24}{row['count']:>8}{row['errors']:>8}{row['throughput']:>10.1f}"
+              f"{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            found = regressions(summary, json.load(file), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
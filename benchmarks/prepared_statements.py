@@ -0,0 +1,78 @@
+import argparse
+import datetime
+import random
+import re
+import time
+
+from dotenv import dotenv_values
+from psycopg2.pool import ThreadedConnectionPool
+
+import bloodbank
+from bloodbank import FetchMode
+from bloodbank.queries import CATALOG
+
+# Read-heavy mix of (statement, id column, remaining arguments), in the proportions the interactive commands
+# produce; the paginated statements get the keyset of their first page
+MIX: tuple = (
+    ('doctor_appointments', 'staff_id', (datetime.datetime.min, 0, 20)),
+    ('doctor_appointments', 'staff_id', (datetime.datetime.min, 0, 20)),
+    ('patient_appointments', 'patient_id', (datetime.datetime.min, 0, 20)),
+    ('author_announcements', 'staff_id', (0, 20)),
+    ('medical_record', 'patient_id', ()),
+)
+
+PARAMETER = re.compile(r'\$(\d+)')
+
+
+def _unprepared(terminal: bloodbank.Terminal, name: str, values: tuple):
+    # Every $n becomes %s, with the values reordered to match where they appear
+    sql = CATALOG[name]
+    ordered = [values[int(n) - 1] for n in PARAMETER.findall(sql)]
+    terminal.execute_query(PARAMETER.sub('%s', sql), FetchMode.ALL, *ordered)
+
+
+def _prepared(terminal: bloodbank.Terminal, name: str, values: tuple):
+    terminal.execute(name, FetchMode.ALL, *values)
+
+
+def run(terminal: bloodbank.Terminal, runner, ids: dict, iterations: int) -> float:
+    rng = random.Random(0)
+    start = time.perf_counter()
+
+    for _ in range(iterations):
+        name, column, rest = rng.choice(MIX)
+        runner(terminal, name, (rng.choice(ids[column]), *rest))
+
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare ad-hoc and prepared execution of the read-heavy command mix')
+    parser.add_argument('--iterations', type=int, default=5000)
+    args = parser.parse_args()
+
+    config: dict = dotenv_values('.env')
+    pool = ThreadedConnectionPool(
+        1, 1,
+        dbname=config.get('DB_NAME'),
+        user=config.get('USER'),
+        password=config.get('PASSWORD'),
+        connection_factory=bloodbank.Connection
+    )
+    terminal = bloodbank.Terminal(pool)
+
+    with terminal.session():
+        ids = {
+            'staff_id': [r.staff_id for r in terminal.execute_query("SELECT staff_id FROM staff", FetchMode.ALL)],
+            'patient_id': [r.patient_id for r in terminal.execute_query("SELECT patient_id FROM patient", FetchMode.ALL)],
+        }
+
+        for label, runner in (('ad-hoc', _unprepared), ('prepared', _prepared)):
+            elapsed = run(terminal, runner, ids, args.iterations)
+            print(f"{label:<10} {args.iterations / elapsed:>10.1f} queries/s  {elapsed * 1e6 / args.iterations:>8.1f} us/query")
+
+    pool.closeall()
+
+
+if __name__ == '__main__':
+    main()
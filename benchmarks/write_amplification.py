@@ -0,0 +1,92 @@
+import argparse
+import json
+import re
+import time
+
+import psycopg2
+from dotenv import dotenv_values
+
+# Each workload runs inside a transaction that is rolled back, so the database is left unchanged
+WORKLOADS: dict[str, str] = {
+    'bulk appointment insert': """
+        INSERT INTO appointment (type, patient, doctor, time, room, description)
+        SELECT 'Blood test',
+               (SELECT min(patient_id) FROM patient),
+               (SELECT min(staff_id) FROM staff WHERE status = 'Doctor'),
+               TIMESTAMP '2100-01-01' + n * INTERVAL '30 minutes',
+               1, 'Write amplification benchmark'
+        FROM generate_series(1, %(rows)s) AS n""",
+    'bulk health card update': """
+        UPDATE health_card
+        SET weight = weight + 1, height = height
+        WHERE health_card_id IN (SELECT health_card_id FROM health_card ORDER BY health_card_id LIMIT %(rows)s)""",
+}
+
+TABLES: tuple = ('appointment', 'bill', 'action', 'health_card')
+PARTITIONS: re.Pattern = re.compile(rf"^({'|'.join(TABLES)})(_\d{{4}}_\d{{2}}|_default)?$")
+
+
+def measure(connection, sql: str, rows: int) -> dict:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_current_wal_insert_lsn()")
+        lsn = cursor.fetchone()[0]
+
+        start = time.perf_counter()
+        cursor.execute(sql, {'rows': rows})
+        elapsed = time.perf_counter() - start
+
+        # Partitions (action_YYYY_MM, action_default) are counted under their parent table
+        cursor.execute(
+            "SELECT relname, n_tup_ins, n_tup_upd FROM pg_stat_xact_user_tables WHERE relname ~ %s",
+            (PARTITIONS.pattern,)
+        )
+        tuples = {name: {'inserted': 0, 'updated': 0} for name in TABLES}
+        for relname, ins, upd in cursor.fetchall():
+            table = tuples[PARTITIONS.fullmatch(relname)[1]]
+            table['inserted'] += ins
+            table['updated'] += upd
+
+        cursor.execute("SELECT pg_wal_lsn_diff(pg_current_wal_insert_lsn(), %s)", (lsn,))
+        wal = int(cursor.fetchone()[0])
+
+    connection.rollback()
+
+    written = sum(t['inserted'] + t['updated'] for t in tuples.values())
+    return {
+        'rows': rows,
+        'seconds': elapsed,
+        'wal_bytes': wal,
+        'tuples_written': written,
+        'amplification': written / rows,
+        'tables': tuples,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure tuples and WAL written per row by bulk writes')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--label', default='current', help='e.g. "row triggers" before migration 0003')
+    parser.add_argument('--output', help='append the results as a JSON line to this path')
+    args = parser.parse_args()
+
+    config: dict = dotenv_values('.env')
+    connection = psycopg2.connect(
+        dbname=config.get('DB_NAME'),
+        user=config.get('USER'),
+        password=config.get('PASSWORD')
+    )
+
+    results = {name: measure(connection, sql, args.rows) for name, sql in WORKLOADS.items()}
+    connection.close()
+
+    for name, result in results.items():
+        print(f"{name:<26} {result['seconds']:>8.3f} s {result['wal_bytes'] / result['rows']:>10.1f} WAL bytes/row "
+              f"{result['amplification']:>6.2f} tuples/row")
+
+    if args.output:
+        with open(args.output, 'a') as file:
+            file.write(json.dumps({'label': args.label, 'results': results}) + '\n')
+
+
+if __name__ == '__main__':
+    main()
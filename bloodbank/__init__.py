@@ -1,9 +1,19 @@
+import contextlib
 import enum
-import os
+import itertools
+import threading
+import time
 from collections import namedtuple
 
+import psycopg2
+import psycopg2.errors
+from psycopg2.extensions import connection as _connection
 from psycopg2.extras import NamedTupleCursor
 
+from bloodbank.cache import Cache
+from bloodbank.queries import CATALOG
+from bloodbank.stats import QueryStats, slow_log
+
 SYSTEM_ENTRY_MSG: str = """
 
 
@@ -34,19 +44,29 @@ HELP_MSG: str = """
     {padding}▄▀▀▀█▄ ▐█.▪▄█▀▀█ ██▪ ██▪     View appointments ............................... s2 (p2)
     {padding}▐█▄▪▐█ ▐█▌·▐█ ▪▐▌██▌.██▌.    Delete appointment .............................. s3
     {padding} ▀▀▀▀  ▀▀▀  ▀  ▀ ▀▀▀ ▀▀▀     Update appointment .............................. s4  
+    {padding}Schedule appointments from CSV ............................................... s15
+    {padding}Search patients .............................................................. s16
+    {padding}Search health records ........................................................ s18
+    {padding}Ingest vitals from CSV ....................................................... s20
+    {padding}Find available slots ......................................................... s21 (p3)
     {padding}Create announcement .......................................................... s5
     {padding}View announcements ........................................................... s6
+    {padding}Search announcements ......................................................... s17
     {padding}Delete announcement (Admin) .................................................. s7
     {padding}Update announcement (Admin) .................................................. s8
     {padding}Create bill .................................................................. s9
     {padding}View bills ................................................................... s10
     {padding}Delete bill (Admin) .......................................................... s11
+    {padding}View query statistics (Admin) ................................................ s12
+    {padding}View logs journal (Admin) .................................................... s13
+    {padding}View report (Admin) .......................................................... s14
+    {padding}Export to CSV (Admin) ........................................................ s19
 
 
     {padding} ▄▄▄· ▄▄▄· ▄▄▄▄▄▪  ▄▄▄ . ▐ ▄ ▄▄▄▄▄   Get medical record ...................... p0
     {padding}▐█ ▄█▐█ ▀█ •██  ██ ▀▄.▀·•█▌▐█•██     Update medical record ................... p1
     {padding} ██▀·▄█▀▀█  ▐█.▪▐█·▐▀▀▪▄▐█▐▐▌ ▐█.▪   View appointments ....................... p2 (s2)
-    {padding}▐█▪·•▐█ ▪▐▌ ▐█▌·▐█▌▐█▄▄▌██▐█▌ ▐█▌·   
+    {padding}▐█▪·•▐█ ▪▐▌ ▐█▌·▐█▌▐█▄▄▌██▐█▌ ▐█▌·   Find available slots .................... p3 (s21)
     {padding}.▀    ▀  ▀  ▀▀▀ ▀▀▀ ▀▀▀ ▀▀ █▪ ▀▀▀    
     
     
@@ -82,6 +102,20 @@ ANNOUNCEMENT_MSG: str = """
         +---------------------------------------------------+
         {description}"""
 
+ACTION_MSG: str = "        {action_id:>10}  {time:<26} {type:<13} {subject:<16} -> {object:<16}"
+
+PATIENT_MATCH_MSG: str = "        {rank:>6.3f}  #{patient_id:<8} {full_name:<30} {email:<32} {phone}"
+
+HEALTH_CARD_MATCH_MSG: str = "        {rank:>6.3f}  record #{record_id:<8} patient #{patient_id:<8} {info}"
+
+REPORT_CELL_MSG: str = "{value:<20.20}"
+
+STATS_HEADER_MSG: str = """
+        {command:<24} {statement:<40} {calls:>8} {total:>10} {mean:>8} {p50:>8} {p95:>8} {p99:>8} {max:>8}"""
+
+STATS_ROW_MSG: str = \
+    "        {command:<24} {statement:<40.40} {calls:>8} {total:>10.1f} {mean:>8.2f} {p50:>8.2f} {p95:>8.2f} {p99:>8.2f} {max:>8.2f}"
+
 class FetchMode(enum.Enum):
     ONE = 0
     ALL = 1
@@ -89,29 +123,285 @@ class FetchMode(enum.Enum):
     NONE = 3
 
 
-class Terminal:
-    def __init__(self, connection):
-        self._connection = connection
-        columns, _ = os.get_terminal_size(0)
+class Connection(_connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared: set[str] = set()
+
+
+# Errors after which the whole transaction can simply be run again
+RETRYABLE: tuple = (psycopg2.errors.SerializationFailure, psycopg2.errors.DeadlockDetected)
 
-        print(SYSTEM_ENTRY_MSG.format(padding=" " * ((columns - 81) // 2)))
+
+class Terminal:
+    def __init__(
+            self, pool, batch_size: int = 500, slow_query_ms: float = 200, retries: int = 3, cache: Cache | None = None,
+            replicas: list | None = None, retry_after: float = 5.0
+    ):
+        self._pool = pool
+        self.replicas = replicas or []
+        self.retry_after = retry_after
+        self._turns = itertools.count()
+        self.cache = cache or Cache()
+        self._cursors = itertools.count()
+        self.batch_size = batch_size
+        self.retries = retries
+        self.stats = QueryStats(slow_query_ms / 1000)
+        self._slots = threading.BoundedSemaphore(pool.maxconn)
+        self._local = threading.local()
 
     @property
     def connection(self):
-        return self._connection
+        return self._local.connection
+
+    @property
+    def queries(self) -> int:
+        return getattr(self._local, 'queries', 0)
+
+    @contextlib.contextmanager
+    def command(self, name: str):
+        self._local.command, self._local.queries = name, 0
+        try:
+            yield
+        finally:
+            self._local.command = None
+
+    @contextlib.contextmanager
+    def session(self, read_only: bool = False):
+        # Connections are handed out in autocommit mode: a lone read is its own transaction, so nothing is
+        # left idle in transaction between commands. Multi-statement writes go through transaction().
+        # A read_only session goes to a healthy replica when there is one; nested sessions join the outer one.
+        if getattr(self._local, 'depth', 0):
+            self._local.depth += 1
+            try:
+                yield self._local.connection
+            finally:
+                self._local.depth -= 1
+            return
+
+        replica, connection = self._checkout(read_only)
+        pool, slots = (replica.pool, replica.slots) if replica else (self._pool, self._slots)
+
+        self._local.connection, self._local.replica, self._local.depth = connection, replica, 1
+        try:
+            yield connection
+            connection.commit()
+        except BaseException as e:
+            if replica and isinstance(e, psycopg2.OperationalError):
+                replica.mark_down(self.retry_after)
+            if not connection.closed:
+                connection.rollback()
+            raise
+        finally:
+            self._local.connection, self._local.replica, self._local.depth = None, None, 0
+            self._local.last_replica = replica
+            pool.putconn(connection, close=bool(connection.closed))
+            slots.release()
+
+    def _checkout(self, read_only: bool):
+        healthy = [replica for replica in self.replicas if replica.healthy] if read_only else []
+
+        if healthy:
+            replica = healthy[next(self._turns) % len(healthy)]
+            replica.slots.acquire()
+            try:
+                connection = replica.pool.getconn()
+            except psycopg2.OperationalError:
+                replica.mark_down(self.retry_after)
+            else:
+                try:
+                    connection.autocommit = True
+                    if self._caught_up(replica, connection):
+                        return replica, connection
+                except psycopg2.OperationalError:
+                    replica.mark_down(self.retry_after)
+                replica.pool.putconn(connection, close=bool(connection.closed))
+            replica.slots.release()
+
+        self._slots.acquire()
+        try:
+            connection = self._pool.getconn()
+            connection.autocommit = True
+        except BaseException:
+            self._slots.release()
+            raise
+        return None, connection
+
+    def _caught_up(self, replica, connection) -> bool:
+        # Read-your-writes: after this thread's last write, a replica is used only once it has replayed that write.
+        # Replay only moves forward, so each replica is checked once per write, and the LSN is dropped only when
+        # every replica in rotation has passed.
+        lsn = getattr(self._local, 'lsn', None)
+        if lsn is None or replica in self._local.confirmed:
+            return True
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_last_wal_replay_lsn() >= %s::pg_lsn", (lsn,))
+            caught_up = bool(cursor.fetchone()[0])
+
+        if caught_up:
+            self._local.confirmed.add(replica)
+            if self._local.confirmed.issuperset(self.replicas):
+                self._local.lsn = None
+        return caught_up
+
+    def read(self, func, *args, **kwargs):
+        # Runs func in a read_only session; a read that fails because its replica went away runs again on the primary
+        if getattr(self._local, 'depth', 0):
+            return func(*args, **kwargs)
+
+        try:
+            with self.session(read_only=True):
+                return func(*args, **kwargs)
+        except psycopg2.OperationalError:
+            if getattr(self._local, 'last_replica', None) is None:
+                raise
+
+        with self.session():
+            return func(*args, **kwargs)
+
+    @contextlib.contextmanager
+    def transaction(self, read_only: bool = False):
+        # Nested calls join the outermost transaction, which alone commits or rolls back
+        if getattr(self._local, 'transaction', False):
+            yield self.connection
+            return
+
+        connection = self.connection
+        connection.set_session(readonly=read_only, autocommit=False)
+        self._local.transaction = True
+        try:
+            yield connection
+            connection.commit()
+        except BaseException:
+            connection.rollback()
+            raise
+        finally:
+            self._local.transaction = False
+            connection.set_session(readonly='default', autocommit=True)
+
+        if self.replicas and not read_only:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_current_wal_insert_lsn()")
+                self._local.lsn, self._local.confirmed = cursor.fetchone()[0], set()
+
+    def atomic(self, func, *args, read_only: bool = False, **kwargs):
+        # Runs func in one transaction, starting over on serialization failures and deadlocks.
+        # Inside an outer transaction the error is left to the outer call, which owns the retry.
+        if getattr(self._local, 'transaction', False):
+            return func(*args, **kwargs)
+
+        for attempt in itertools.count(1):
+            try:
+                with self.transaction(read_only):
+                    return func(*args, **kwargs)
+            except RETRYABLE:
+                if attempt > self.retries:
+                    raise
+                time.sleep(0.01 * 2 ** attempt)
+
+    def execute_query(self, query, mode: FetchMode, *values, statement: str | None = None) -> namedtuple:
+        statement = statement or ' '.join(query.split())[:60]
+
+        if mode == FetchMode.MANY:
+            return self._stream(query, values, statement)
 
-    def execute_query(self, query, mode: FetchMode, *values) -> namedtuple:
         with self.connection.cursor(cursor_factory=NamedTupleCursor) as cursor:
+            start = time.perf_counter()
             cursor.execute(query, values)
 
             if mode == FetchMode.ONE:
-                return cursor.fetchone()
+                result = cursor.fetchone()
             elif mode == FetchMode.ALL:
-                return cursor.fetchall()
-            elif mode == FetchMode.NONE:
-                return
+                result = cursor.fetchall()
+            else:
+                result = None
+
+        self._record(statement, time.perf_counter() - start, query, values)
+        return result
+
+    def _record(self, statement: str, elapsed: float, query=None, values=()):
+        self._local.queries = self.queries + 1
+        self.stats.record(getattr(self._local, 'command', None) or '-', statement, elapsed)
+
+        if query is not None and self.stats.is_slow(elapsed):
+            slow_log.warning(
+                "%.1f ms [%s] %s\n%s", elapsed * 1000, statement, ' '.join(query.split()), self.explain(query, *values)
+            )
+
+    def explain(self, query, *values) -> str:
+        # EXPLAIN ANALYZE runs the statement again, so its effects are always rolled back
+        connection = self.connection
+        begin, rollback = (
+            ("BEGIN", "ROLLBACK") if connection.autocommit else
+            ("SAVEPOINT bloodbank_explain", "ROLLBACK TO SAVEPOINT bloodbank_explain")
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute(begin)
+            try:
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {query}", values)
+                return '\n'.join(row[0] for row in cursor.fetchall())
+            except psycopg2.Error as e:
+                return f"EXPLAIN failed: {e}"
+            finally:
+                cursor.execute(rollback)
+
+    def _stream(self, query, values, statement: str):
+        # Server-side cursor: rows arrive batch_size at a time, so the generator
+        # must be consumed while the session that created it is still open.
+        # A named cursor lives in a transaction, which ends when the generator does.
+        name = f"bloodbank_stream_{next(self._cursors)}"
+
+        with self.transaction(read_only=True) as connection:
+            with connection.cursor(name=name, cursor_factory=NamedTupleCursor) as cursor:
+                cursor.itersize = self.batch_size
+                start = time.perf_counter()
+                cursor.execute(query, values)
+                elapsed, rows = time.perf_counter() - start, iter(cursor)
+
+                # The statement's time is the DECLARE plus every FETCH, not what the consumer does between rows.
+                # A consumer that stops early still gets what was fetched so far recorded.
+                try:
+                    while True:
+                        start = time.perf_counter()
+                        row = next(rows, None)
+                        elapsed += time.perf_counter() - start
+                        if row is None:
+                            break
+                        yield row
+                except GeneratorExit:
+                    self._record(statement, elapsed, query, values)
+                    raise
+                self._record(statement, elapsed, query, values)
+
+    def export(self, query, file, *values, statement: str | None = None) -> int:
+        # COPY TO STDOUT hands rows straight to file as they arrive, so memory does not grow with the row count
+        statement = statement or ' '.join(query.split())[:60]
+
+        with self.connection.cursor() as cursor:
+            start = time.perf_counter()
+            copy = f"COPY ({cursor.mogrify(query, values).decode()}) TO STDOUT WITH (FORMAT csv, HEADER)"
+            cursor.copy_expert(copy, file)
+            self._record(statement, time.perf_counter() - start, query, values)
+
+            return cursor.rowcount
+
+    def prepare(self, name: str):
+        connection = self.connection
+
+        if name not in connection.prepared:
+            with connection.cursor() as cursor:
+                cursor.execute(f"PREPARE {name} AS {CATALOG[name]}")
+            connection.prepared.add(name)
+
+    def execute(self, name: str, mode: FetchMode, *values) -> namedtuple:
+        self.prepare(name)
+        arguments = f"({', '.join(['%s'] * len(values))})" if values else ''
+
+        return self.execute_query(f"EXECUTE {name}{arguments}", mode, *values, statement=name)
 
-UserCreds = namedtuple('UserCreds', 'email password status')
+Session = namedtuple('Session', 'id email status full_name')
 MedicalRecord = namedtuple('MedicalRecord', 'record_id patient_id full_name info birth_date height weight bmi')
 Appointment = namedtuple('Appointment', 'appointment_id type patient doctor time room description')
 Announcement = namedtuple('Announcement', 'announcement_id title author description')
@@ -0,0 +1,37 @@
+import argparse
+
+import psycopg2
+from dotenv import dotenv_values
+
+
+def maintain(connection, months_ahead: int = 3, retention: str = '1 year', log=print):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT create_action_partitions(%s)", (months_ahead,))
+        log(f"\tcreated {cursor.fetchone()[0]} action partition(s)")
+
+        cursor.execute("SELECT archive_action_partitions(%s::interval)", (retention,))
+        for (partition,) in cursor.fetchall():
+            log(f"\tarchived {partition} to action_archive.{partition}")
+
+    connection.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create upcoming action log partitions and archive expired ones')
+    parser.add_argument('--ahead', type=int, default=3, help='months of partitions to keep ready')
+    parser.add_argument('--retention', default='1 year', help='keep partitions newer than this interval attached')
+    args = parser.parse_args()
+
+    config: dict = dotenv_values('.env')
+    connection = psycopg2.connect(
+        dbname=config.get('DB_NAME'),
+        user=config.get('USER'),
+        password=config.get('PASSWORD')
+    )
+
+    maintain(connection, args.ahead, args.retention)
+    connection.close()
+
+
+if __name__ == '__main__':
+    main()
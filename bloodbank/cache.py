@@ -0,0 +1,114 @@
+import collections
+import select
+import threading
+import time
+
+import psycopg2
+
+CHANNEL: str = 'bloodbank_cache'
+
+# Small tables cached whole: table (also the NOTIFY payload) -> catalog query
+REFERENCE: dict[str, str] = {
+    'appointment_type': 'appointment_types',
+    'room': 'rooms',
+    'blood_type': 'blood_types',
+    'staff_status': 'staff_statuses',
+}
+
+
+class Cache:
+    def __init__(self, ttl: float = 300, maxsize: int = 4096):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits: int = 0
+        self.misses: int = 0
+        self._lock = threading.Lock()
+        self._entries: collections.OrderedDict = collections.OrderedDict()
+        self._generations: collections.Counter = collections.Counter()
+        self._epoch: int = 0
+
+    def get(self, namespace: str, key, load):
+        return self.get_many(namespace, (key,), lambda keys: {key: load()})[key]
+
+    def get_many(self, namespace: str, keys, load) -> dict:
+        # load(missing keys) -> {key: value}; keys it leaves out are not cached, so new rows need no invalidation
+        found, missing, now = {}, [], time.monotonic()
+
+        with self._lock:
+            version = (self._epoch, self._generations[namespace])
+            for key in keys:
+                entry = self._entries.get((namespace, key))
+                if entry is not None and entry[1] > now:
+                    self._entries.move_to_end((namespace, key))
+                    found[key] = entry[0]
+                elif key not in missing:
+                    missing.append(key)
+
+            self.hits += len(found)
+            self.misses += len(missing)
+
+        if not missing:
+            return found
+
+        loaded = load(missing)
+        found.update(loaded)
+
+        with self._lock:
+            # An invalidation that arrived during the load may be about the rows just read
+            if version != (self._epoch, self._generations[namespace]):
+                return found
+
+            for key, value in loaded.items():
+                self._entries[(namespace, key)] = (value, now + self.ttl)
+                self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+        return found
+
+    def version(self, namespace: str) -> tuple:
+        # Changes whenever the namespace, or the whole cache, is invalidated
+        with self._lock:
+            return self._epoch, self._generations[namespace]
+
+    def invalidate(self, namespace: str | None = None, tag: str | None = None):
+        # A tag drops only the keys of the namespace that start with it, e.g. one day of availability
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+                self._epoch += 1
+                return
+
+            self._generations[namespace] += 1
+            for key in [key for key in self._entries
+                        if key[0] == namespace and (tag is None or isinstance(key[1], tuple) and key[1][0] == tag)]:
+                del self._entries[key]
+
+
+class Listener(threading.Thread):
+    def __init__(self, cache: Cache, retry: float = 5, **connect):
+        super().__init__(name='bloodbank-cache-listener', daemon=True)
+        self.cache = cache
+        self.retry = retry
+        self._connect = connect
+
+    def run(self):
+        while True:
+            try:
+                connection = psycopg2.connect(**self._connect)
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+
+                # Nothing was heard while disconnected, so everything cached before may be stale
+                self.cache.invalidate()
+
+                while True:
+                    if select.select([connection], [], [], 60) != ([], [], []):
+                        connection.poll()
+                        while connection.notifies:
+                            namespace, _, tag = connection.notifies.pop(0).payload.partition(':')
+                            self.cache.invalidate(namespace, tag or None)
+            except psycopg2.Error:
+                self.cache.invalidate()
+                time.sleep(self.retry)
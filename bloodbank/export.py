@@ -0,0 +1,95 @@
+import argparse
+import contextlib
+import datetime
+import gzip
+import io
+import sys
+
+from dotenv import dotenv_values
+from psycopg2.pool import ThreadedConnectionPool
+
+import bloodbank
+
+CHUNK_SIZE: int = 1 << 20
+
+# Export name -> query over a [start, end) window, ordered along an index
+EXPORTS: dict[str, str] = {
+    'appointments': """
+        SELECT appointment_id, type, patient, doctor, time, duration, room, description
+        FROM appointment
+        WHERE time >= %s AND time < %s
+        ORDER BY time, appointment_id""",
+    'bills': """
+        SELECT bill_id, issuer, receiver, amount, issued_at
+        FROM bill
+        WHERE issued_at >= %s AND issued_at < %s
+        ORDER BY issued_at, bill_id""",
+    'actions': """
+        SELECT action_id, type, patient_subject, patient_object, staff_subject, staff_object, time
+        FROM action
+        WHERE time >= %s AND time < %s
+        ORDER BY time, action_id""",
+}
+
+
+@contextlib.contextmanager
+def open_target(path: str, compress: bool | None = None, chunk_size: int = CHUNK_SIZE):
+    # '-' is stdout; a .gz path is gzipped unless compress says otherwise. Writes reach the file
+    # (or the compressor) in chunk_size blocks, never row by row.
+    compress = path.endswith('.gz') if compress is None else compress
+
+    with contextlib.ExitStack() as stack:
+        if path == '-':
+            file = sys.stdout.buffer
+            stack.callback(file.flush)
+        else:
+            file = stack.enter_context(open(path, 'wb'))
+        if compress:
+            file = stack.enter_context(gzip.GzipFile(fileobj=file, mode='wb'))
+
+        writer = io.BufferedWriter(file, chunk_size)
+        if file is sys.stdout.buffer:
+            # Closing the writer would close the process's stdout, so it is flushed and detached instead
+            stack.callback(writer.detach)
+            stack.callback(writer.flush)
+        else:
+            stack.enter_context(writer)
+        yield writer
+
+
+def export(terminal: bloodbank.Terminal, name: str, start, end, path: str, compress: bool | None = None) -> int:
+    if name not in EXPORTS:
+        raise ValueError(f'Unknown export {name}!')
+
+    with open_target(path, compress) as file:
+        return terminal.export(EXPORTS[name], file, start, end, statement=f'export {name}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream appointments, bills or the action log for a date range as CSV')
+    parser.add_argument('name', choices=tuple(EXPORTS))
+    parser.add_argument('start', type=lambda d: datetime.datetime.strptime(d, '%d-%m-%Y'), help='dd-mm-yyyy')
+    parser.add_argument('end', type=lambda d: datetime.datetime.strptime(d, '%d-%m-%Y'), help='dd-mm-yyyy, exclusive')
+    parser.add_argument('path', nargs='?', default='-', help="output file, '-' for stdout; .gz compresses")
+    parser.add_argument('--gzip', action='store_true', default=None, help='compress regardless of the file name')
+    args = parser.parse_args()
+
+    config: dict = dotenv_values('.env')
+    pool = ThreadedConnectionPool(
+        1, 1,
+        dbname=config.get('DB_NAME'),
+        user=config.get('USER'),
+        password=config.get('PASSWORD'),
+        connection_factory=bloodbank.Connection
+    )
+    terminal = bloodbank.Terminal(pool)
+
+    with terminal.session():
+        rows = export(terminal, args.name, args.start, args.end, args.path, args.gzip)
+    print(f"\texported {rows} rows", file=sys.stderr)
+
+    pool.closeall()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+import argparse
+import datetime
+import json
+import pathlib
+import re
+import sys
+
+import psycopg2
+from dotenv import dotenv_values
+
+from bloodbank.queries import CATALOG
+
+MIGRATIONS_DIR: pathlib.Path = pathlib.Path(__file__).resolve().parent.parent / 'sql' / 'migrations'
+LOCK_ID: int = 7_153_503
+
+INDEX_SCANS: tuple = ('Index Scan', 'Index Only Scan', 'Bitmap Heap Scan')
+
+# (label, statement, values or a query returning them, relations that must be read through an index)
+CHECKS: tuple = (
+    ('doctor_appointments', 'EXECUTE doctor_appointments(%s, %s, 0, 20)',
+     "SELECT doctor, '0001-01-01'::timestamp FROM appointment GROUP BY doctor ORDER BY count(*) DESC LIMIT 1",
+     ('appointment',)),
+    ('patient_appointments', 'EXECUTE patient_appointments(%s, %s, 0, 20)',
+     "SELECT patient, '0001-01-01'::timestamp FROM appointment GROUP BY patient ORDER BY count(*) DESC LIMIT 1",
+     ('appointment',)),
+    ('author_announcements', 'EXECUTE author_announcements(%s, 0, 20)',
+     "SELECT author FROM announcement GROUP BY author ORDER BY count(*) DESC LIMIT 1",
+     ('announcement',)),
+    ('medical_record', 'EXECUTE medical_record(%s)',
+     "SELECT max(patient_id) FROM patient",
+     ('health_card', 'patient')),
+    ('authenticate', 'EXECUTE authenticate(%s, %s)',
+     "SELECT email, password FROM patient ORDER BY patient_id DESC LIMIT 1",
+     ('staff', 'patient')),
+    ('bills by issuer', 'SELECT * FROM bill WHERE issuer = %s',
+     "SELECT max(issuer) FROM bill",
+     ('bill',)),
+    ('bills by receiver', 'SELECT * FROM bill WHERE receiver = %s',
+     "SELECT max(receiver) FROM bill",
+     ('bill',)),
+    ('recent appointments', 'SELECT time, room, description FROM appointment WHERE time > %s ORDER BY time DESC LIMIT 10',
+     "SELECT max(time) - interval '1 day' FROM appointment",
+     ('appointment',)),
+    ('search_patients', "EXECUTE search_patients(%s, %s, 'Infinity', 0, 20)",
+     "SELECT email, '%' || email || '%' FROM patient ORDER BY patient_id DESC LIMIT 1",
+     ('patient',)),
+    ('available_slots', "EXECUTE available_slots(%s, '08:00', '18:00', '30 minutes', %s, NULL)",
+     "SELECT ARRAY[max(time)::date], doctor FROM appointment GROUP BY doctor ORDER BY count(*) DESC LIMIT 1",
+     ('appointment',)),
+    ('action log window', 'SELECT * FROM action WHERE time >= %s AND time < %s',
+     "SELECT max(time) - interval '1 hour', max(time) FROM action",
+     ('action',)),
+)
+
+
+def migrations() -> list[tuple[int, str, pathlib.Path]]:
+    found = []
+    for path in sorted(MIGRATIONS_DIR.glob('*.sql')):
+        match = re.fullmatch(r'(\d+)_(\w+)\.sql', path.name)
+        if match:
+            found.append((int(match[1]), match[2], path))
+    return found
+
+
+def applied(connection) -> set[int]:
+    with connection.cursor() as cursor:
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migration
+        (
+            version integer PRIMARY KEY,
+            name text NOT NULL,
+            applied_at timestamp NOT NULL DEFAULT NOW()
+        )""")
+        cursor.execute("SELECT version FROM schema_migration")
+        versions = {row[0] for row in cursor.fetchall()}
+
+    connection.commit()
+    return versions
+
+
+def migrate(connection, reapply: tuple = (), log=print) -> int:
+    # Each migration runs in its own transaction together with its version row,
+    # and the advisory lock keeps concurrent runners from interleaving
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_lock(%s)", (LOCK_ID,))
+
+    try:
+        done, count = applied(connection), 0
+
+        for version, name, path in migrations():
+            if version in done and version not in reapply:
+                continue
+
+            with connection.cursor() as cursor:
+                cursor.execute(path.read_text())
+                cursor.execute(
+                    "INSERT INTO schema_migration (version, name) VALUES (%s, %s) "
+                    "ON CONFLICT (version) DO UPDATE SET applied_at = NOW()",
+                    (version, name)
+                )
+            connection.commit()
+
+            log(f"\tapplied {version:04d} {name}")
+            count += 1
+
+        return count
+    except BaseException:
+        connection.rollback()
+        raise
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (LOCK_ID,))
+        connection.commit()
+
+
+def _scans(plan: dict):
+    yield plan.get('Node Type'), plan.get('Relation Name')
+    for child in plan.get('Plans', ()):
+        yield from _scans(child)
+
+
+def check(connection, log=print) -> bool:
+    ok = True
+
+    with connection.cursor() as cursor:
+        for name, sql in CATALOG.items():
+            cursor.execute(f"PREPARE {name} AS {sql}")
+
+        for label, statement, sample, relations in CHECKS:
+            cursor.execute(sample)
+            values = cursor.fetchone()
+
+            if values is None or None in values:
+                log(f"\tSKIP {label}: no sample data")
+                continue
+
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {statement}", values)
+            plan = cursor.fetchone()[0]
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            scans = list(_scans(plan[0]['Plan']))
+
+            for relation in relations:
+                # Partitions of a partitioned table count as the table itself
+                pattern = rf'{relation}(_\d{{4}}_\d{{2}}|_default)?'
+                types = {node for node, rel in scans if rel and re.fullmatch(pattern, rel)}
+                passed = bool(types & set(INDEX_SCANS)) and 'Seq Scan' not in types
+                ok = ok and passed
+                log(f"\t{'OK  ' if passed else 'FAIL'} {label:<22} {relation:<12} {', '.join(sorted(types))}")
+
+    connection.rollback()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply pending migrations from sql/migrations')
+    parser.add_argument('--check', action='store_true', help='verify that hot-path queries use index scans')
+    parser.add_argument('--reapply', type=int, nargs='*', default=(), help='run these versions again')
+    args = parser.parse_args()
+
+    config: dict = dotenv_values('.env')
+    connection = psycopg2.connect(
+        dbname=config.get('DB_NAME'),
+        user=config.get('USER'),
+        password=config.get('PASSWORD')
+    )
+
+    start = datetime.datetime.now()
+    count = migrate(connection, tuple(args.reapply))
+    print(f"\t{count} migration(s) applied in {(datetime.datetime.now() - start).total_seconds():.2f} s")
+
+    if args.check and not check(connection):
+        connection.close()
+        sys.exit(1)
+
+    connection.close()
+
+
+if __name__ == '__main__':
+    main()
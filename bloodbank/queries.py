@@ -0,0 +1,157 @@
+CATALOG: dict[str, str] = {
+    'authenticate': """
+        SELECT 'staff' AS kind, staff_id AS id, email, status, CONCAT(first_name, ' ', last_name) AS full_name
+        FROM staff
+        WHERE email=$1 AND password=$2
+        UNION ALL
+        SELECT 'patient', patient_id, email, NULL, CONCAT(first_name, ' ', last_name)
+        FROM patient
+        WHERE email=$1 AND password=$2
+        LIMIT 1""",
+
+    'sign_up': """
+        INSERT INTO patient (email, username, password, first_name, last_name, phone)
+        VALUES ($1, $2, $3, $4, $5, $6)
+        RETURNING patient_id""",
+
+    'medical_record': """
+        SELECT
+            health_card_id AS record_id,
+            patient AS patient_id,
+            CONCAT(sup.first_name, ' ', sup.last_name) AS full_name,
+            description AS info,
+            birth_date, height, weight, bmi
+        FROM health_card
+        JOIN patient AS sup
+        ON patient_id=patient
+        WHERE patient=$1""",
+
+    'patient_appointments': """
+        SELECT a.appointment_id, a.time, a.description, a.room, a.type, a.patient, a.doctor
+        FROM appointment a
+        WHERE a.patient=$1 AND (a.time, a.appointment_id) > ($2::timestamp, $3::integer)
+        ORDER BY a.time, a.appointment_id
+        LIMIT $4""",
+
+    'doctor_appointments': """
+        SELECT a.appointment_id, a.time, a.description, a.room, a.type, a.patient, a.doctor
+        FROM appointment a
+        WHERE a.doctor=$1 AND (a.time, a.appointment_id) > ($2::timestamp, $3::integer)
+        ORDER BY a.time, a.appointment_id
+        LIMIT $4""",
+
+    'create_appointment': """
+        INSERT INTO appointment (type, patient, doctor, time, room, description, duration)
+        SELECT $1::varchar, $2, $3, $4, $5, $6, duration
+        FROM appointment_type
+        WHERE name = $1::varchar
+        RETURNING appointment_id, type, patient, doctor, time, room, description""",
+
+    'delete_appointment': """
+        DELETE FROM appointment
+        WHERE appointment_id=$1""",
+
+    'create_announcement': """
+        INSERT INTO announcement (title, description, author)
+        VALUES ($1, $2, $3)
+        RETURNING announcement_id, title, author, description""",
+
+    'author_announcements': """
+        SELECT announcement_id, title, author, description
+        FROM announcement
+        WHERE author=$1 AND announcement_id > $2
+        ORDER BY announcement_id
+        LIMIT $3""",
+
+    'delete_announcement': """
+        DELETE FROM announcement
+        WHERE announcement_id=$1""",
+
+    'action_log': """
+        SELECT action_id, type, patient_subject, patient_object, staff_subject, staff_object, time
+        FROM action
+        WHERE time >= $1 AND time < $2 AND (time, action_id) > ($3::timestamp, $4::bigint)
+        ORDER BY time, action_id
+        LIMIT $5""",
+
+    'staff_names': """
+        SELECT staff_id AS id, CONCAT(first_name, ' ', last_name) AS full_name
+        FROM staff
+        WHERE staff_id = ANY($1::integer[])""",
+
+    'patient_names': """
+        SELECT patient_id AS id, CONCAT(first_name, ' ', last_name) AS full_name
+        FROM patient
+        WHERE patient_id = ANY($1::integer[])""",
+
+    'appointment_types': "SELECT name, duration FROM appointment_type ORDER BY name",
+
+    'rooms': "SELECT room_id, building FROM room ORDER BY room_id",
+
+    'blood_types': "SELECT name FROM blood_type ORDER BY name",
+
+    'staff_statuses': "SELECT name FROM staff_status ORDER BY name",
+
+    # Search results are ranked best first and paged by (rank, id) after the previous page's last row.
+    # Patients match on a substring, or on a trigram word match (<%) that tolerates misspellings;
+    # the GIN trigram indexes serve both.
+    'search_patients': """
+        SELECT *
+        FROM (
+            SELECT
+                patient_id,
+                CONCAT(first_name, ' ', last_name) AS full_name,
+                email,
+                phone,
+                GREATEST(
+                    word_similarity($1, first_name || ' ' || last_name),
+                    COALESCE(similarity(email, $1), 0),
+                    COALESCE(similarity(phone, $1), 0)
+                ) AS rank
+            FROM patient
+            WHERE (first_name || ' ' || last_name) ILIKE $2 OR email ILIKE $2 OR phone ILIKE $2
+                OR $1 <% (first_name || ' ' || last_name) OR $1 <% email
+        ) AS found
+        WHERE (rank, patient_id) < ($3::real, $4::integer)
+        ORDER BY rank DESC, patient_id DESC
+        LIMIT $5""",
+
+    'search_announcements': """
+        SELECT *
+        FROM (
+            SELECT announcement_id, title, author, description, ts_rank(search, query) AS rank
+            FROM announcement, websearch_to_tsquery('pg_catalog.english', $1) AS query
+            WHERE search @@ query
+        ) AS found
+        WHERE (rank, announcement_id) < ($2::real, $3::integer)
+        ORDER BY rank DESC, announcement_id DESC
+        LIMIT $4""",
+
+    'search_health_cards': """
+        SELECT *
+        FROM (
+            SELECT health_card_id AS record_id, patient AS patient_id, description AS info, ts_rank(search, query) AS rank
+            FROM health_card, websearch_to_tsquery('pg_catalog.english', $1) AS query
+            WHERE search @@ query
+        ) AS found
+        WHERE (rank, record_id) < ($2::real, $3::integer)
+        ORDER BY rank DESC, record_id DESC
+        LIMIT $4""",
+
+    # Free slots of length $4 between opening $2 and closing $3 on each day of $1. A NULL doctor or room matches
+    # no appointment and so leaves that side unconstrained; both probes are served by the exclusion constraints' indexes
+    'available_slots': """
+        SELECT slot
+        FROM unnest($1::date[]) AS day,
+             generate_series(day + $2::time, day + $3::time - $4::interval, $4::interval) AS slot
+        WHERE NOT EXISTS (
+                SELECT 1 FROM appointment a
+                WHERE a.doctor = $5::integer
+                    AND tsrange(a.time, a.time + a.duration) && tsrange(slot, slot + $4::interval)
+            ) AND NOT EXISTS (
+                SELECT 1 FROM appointment a
+                WHERE a.room = $6::integer
+                    AND tsrange(a.time, a.time + a.duration) && tsrange(slot, slot + $4::interval)
+            )
+        ORDER BY slot""",
+}
@@ -0,0 +1,79 @@
+import threading
+import time
+
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+import bloodbank
+
+
+class Replica:
+    def __init__(self, dsn: str, maxconn: int = 8):
+        self.dsn = dsn
+        self.maxconn = maxconn
+        self.slots = threading.BoundedSemaphore(maxconn)
+        self.down_until: float = 0.0
+        self.probed_ok: bool = True
+        self.lag: int | None = None
+        self._pool: ThreadedConnectionPool | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self) -> ThreadedConnectionPool:
+        # Built on first checkout, so an unreachable replica fails there (and is marked down) instead of at startup.
+        # minconn stays 1 because psycopg2 closes every returned connection beyond minconn.
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadedConnectionPool(1, self.maxconn, self.dsn, connection_factory=bloodbank.Connection)
+            return self._pool
+
+    @property
+    def healthy(self) -> bool:
+        # Failed reads mark a replica down for a while; the health check's verdict is kept apart, so a good probe
+        # does not cut that pause short
+        return self.probed_ok and self.down_until <= time.monotonic()
+
+    def mark_down(self, seconds: float):
+        self.down_until = time.monotonic() + seconds
+
+
+class HealthCheck(threading.Thread):
+    # Probes every replica on its own connection. Unreachable replicas, and replicas whose replay is more than
+    # max_lag bytes of WAL behind the primary, get no reads until a later probe finds them fine again.
+    def __init__(self, terminal: bloodbank.Terminal, interval: float = 2.0, max_lag: int = 16 << 20):
+        super().__init__(name='bloodbank-replica-health', daemon=True)
+        self.terminal = terminal
+        self.interval = interval
+        self.max_lag = max_lag
+        self._connections: dict = {}
+
+    def run(self):
+        while True:
+            try:
+                with self.terminal.session() as connection, connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_current_wal_lsn()")
+                    lsn = cursor.fetchone()[0]
+            except psycopg2.Error:
+                lsn = None
+
+            for replica in self.terminal.replicas:
+                self.probe(replica, lsn)
+
+            time.sleep(self.interval)
+
+    def probe(self, replica: Replica, lsn: str | None):
+        try:
+            connection = self._connections.get(replica.dsn)
+            if connection is None or connection.closed:
+                connection = self._connections[replica.dsn] = psycopg2.connect(replica.dsn)
+                connection.autocommit = True
+
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_wal_lsn_diff(%s::pg_lsn, pg_last_wal_replay_lsn())", (lsn,))
+                replica.lag = cursor.fetchone()[0]
+        except psycopg2.Error:
+            replica.lag, replica.probed_ok = None, False
+            return
+
+        # With the primary unreachable the lag is unknown, but the replica can still serve reads
+        replica.probed_ok = lsn is None or (replica.lag is not None and replica.lag <= self.max_lag)
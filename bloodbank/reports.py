@@ -0,0 +1,63 @@
+import argparse
+import time
+
+import psycopg2
+from psycopg2 import sql
+from dotenv import dotenv_values
+
+# Report name -> (materialized view, sort order)
+REPORTS: dict[str, tuple[str, str]] = {
+    'avg_bill': ('report_avg_bill_by_issuer', 'issuer'),
+    'daily_appointments': ('report_appointments_per_day', 'day DESC'),
+    'room_stats': ('report_room_stats', 'num_patients'),
+    'doctor_totals': ('report_doctor_totals', 'total_amount DESC'),
+    'healthy_patients': ('report_healthy_patients', 'patient_id'),
+}
+
+
+def refresh(connection, force: bool = False, log=print):
+    # Each flag is cleared and committed before its view is rebuilt, so a write that commits during the
+    # refresh marks the report dirty again instead of being lost behind dirty = false
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM report_refresh WHERE dirty OR %s ORDER BY name", (force,))
+        reports = [name for (name,) in cursor.fetchall()]
+    connection.commit()
+
+    for report in reports:
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE report_refresh SET dirty = false WHERE name = %s", (report,))
+            connection.commit()
+
+            cursor.execute(sql.SQL("REFRESH MATERIALIZED VIEW CONCURRENTLY {}").format(sql.Identifier(report)))
+            cursor.execute("UPDATE report_refresh SET refreshed_at = NOW() WHERE name = %s", (report,))
+            connection.commit()
+
+        log(f"\trefreshed {report}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Refresh the materialized reports whose source tables changed')
+    parser.add_argument('--force', action='store_true', help='refresh every report')
+    parser.add_argument('--every', type=float, help='keep running, refreshing every N seconds')
+    args = parser.parse_args()
+
+    config: dict = dotenv_values('.env')
+    connection = psycopg2.connect(
+        dbname=config.get('DB_NAME'),
+        user=config.get('USER'),
+        password=config.get('PASSWORD')
+    )
+
+    try:
+        refresh(connection, args.force)
+        while args.every:
+            time.sleep(args.every)
+            refresh(connection)
+    except KeyboardInterrupt:
+        pass
+
+    connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+import csv
+import datetime
+from collections import namedtuple
+
+from bloodbank.seed import RowStream
+
+Booking = namedtuple('Booking', 'line appointment_id reason')
+
+TIME_FORMAT: str = '%d-%m-%Y %H:%M'
+
+# One row per CSV line; rows that fail to parse arrive with their reason already set
+STAGE_SQL: str = """
+    CREATE TEMPORARY TABLE IF NOT EXISTS appointment_stage
+    (
+        line integer PRIMARY KEY,
+        appointment_id integer,
+        type varchar(32),
+        patient integer,
+        doctor integer,
+        time timestamp,
+        room integer,
+        description text,
+        duration interval,
+        reason text
+    ) ON COMMIT DELETE ROWS"""
+
+STAGE_COLUMNS: str = 'line, type, patient, doctor, time, room, description, duration, reason'
+
+VALIDATE_SQL: str = """
+    UPDATE appointment_stage s
+    SET reason = CASE
+        WHEN NOT EXISTS (SELECT 1 FROM appointment_type t WHERE t.name = s.type) THEN 'unknown type'
+        WHEN NOT EXISTS (SELECT 1 FROM patient p WHERE p.patient_id = s.patient) THEN 'unknown patient'
+        WHEN NOT EXISTS (SELECT 1 FROM staff d WHERE d.staff_id = s.doctor) THEN 'unknown doctor'
+        WHEN NOT EXISTS (SELECT 1 FROM room r WHERE r.room_id = s.room) THEN 'unknown room'
+        END
+    WHERE reason IS NULL"""
+
+# Ids are drawn up front so that RETURNING can be matched back to CSV lines;
+# rows without minutes take their type's slot length
+NUMBER_SQL: str = """
+    UPDATE appointment_stage s
+    SET appointment_id = nextval(pg_get_serial_sequence('appointment', 'appointment_id')),
+        duration = COALESCE(s.duration, (SELECT t.duration FROM appointment_type t WHERE t.name = s.type))
+    WHERE reason IS NULL"""
+
+# The exclusion constraints reject overlaps with existing rows and with earlier lines of the same file
+INSERT_SQL: str = """
+    WITH inserted AS (
+        INSERT INTO appointment (appointment_id, type, patient, doctor, time, room, description, duration)
+        SELECT appointment_id, type, patient, doctor, time, room, description, duration
+        FROM appointment_stage
+        WHERE reason IS NULL
+        ORDER BY line
+        ON CONFLICT DO NOTHING
+        RETURNING appointment_id
+    )
+    UPDATE appointment_stage s
+    SET reason = 'conflict', appointment_id = NULL
+    WHERE reason IS NULL AND NOT EXISTS (SELECT 1 FROM inserted i WHERE i.appointment_id = s.appointment_id)"""
+
+EXPLAIN_SQL: str = """
+    UPDATE appointment_stage s
+    SET reason = CASE WHEN EXISTS (
+            SELECT 1 FROM appointment a
+            WHERE a.doctor = s.doctor AND tsrange(a.time, a.time + a.duration) && tsrange(s.time, s.time + s.duration)
+        ) THEN 'doctor busy' ELSE 'room busy' END
+    WHERE reason = 'conflict'"""
+
+REPORT_SQL: str = "SELECT line, appointment_id, reason FROM appointment_stage ORDER BY line"
+
+
+def parse(lines, doctor: int | None = None):
+    # type, patient, doctor, dd-mm-yyyy HH:MM, room[, description[, minutes]]; an empty doctor means `doctor`
+    for line, row in enumerate(csv.reader(lines), 1):
+        if not row or row[0].startswith('#'):
+            continue
+
+        try:
+            app_type, patient, staff, timestamp, room, *rest = (field.strip() for field in row)
+            description = rest[0] if rest and rest[0] else None
+            minutes = int(rest[1]) if len(rest) > 1 and rest[1] else None
+            if minutes is not None and minutes <= 0:
+                raise ValueError(f'minutes must be positive, got {minutes}')
+
+            yield (
+                line, app_type or 'Unspecified', int(patient), int(staff) if staff else doctor,
+                datetime.datetime.strptime(timestamp, TIME_FORMAT), int(room), description,
+                f'{minutes * 60} seconds' if minutes else None, None
+            )
+        except ValueError as e:
+            yield line, None, None, None, None, None, None, None, f'malformed: {e}'
+
+
+def schedule(connection, rows) -> list[Booking]:
+    # Everything runs in the caller's transaction: one COPY, four set-based statements
+    with connection.cursor() as cursor:
+        cursor.execute(STAGE_SQL)
+        cursor.execute("TRUNCATE appointment_stage")
+        cursor.copy_expert(f"COPY appointment_stage ({STAGE_COLUMNS}) FROM STDIN", RowStream(rows), 1 << 16)
+
+        for statement in (VALIDATE_SQL, NUMBER_SQL, INSERT_SQL, EXPLAIN_SQL):
+            cursor.execute(statement)
+
+        cursor.execute(REPORT_SQL)
+        return [Booking(*row) for row in cursor.fetchall()]
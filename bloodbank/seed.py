@@ -0,0 +1,269 @@
+import argparse
+import datetime
+import io
+import math
+import random
+import time
+
+import psycopg2
+from dotenv import dotenv_values
+
+BLOOD_TYPES: tuple = ('A+', 'A-', 'B+', 'B-', 'O+', 'O-', 'AB+', 'AB-')
+APPOINTMENT_TYPES: tuple = (
+    'Donating blood', 'Receiving blood transfusion', 'Blood test', 'Consultation with doctor', 'Donor eligibility check'
+)
+ACTION_TYPES: tuple = ('appointment', 'announcement', 'bill', 'update', 'delete')
+FIRST_NAMES: tuple = (
+    'Avrit', 'Jonah', 'Lorianne', 'Felike', 'Celestyn', 'Vivyan', 'Carmine', 'Kristal', 'Nelli', 'Barbabas',
+    'Anna', 'Mikhail', 'Olga', 'Ivan', 'Maria', 'Pavel', 'Elena', 'Denis', 'Sofia', 'Artem'
+)
+LAST_NAMES: tuple = (
+    'Cabell', 'Carless', 'Arendt', 'Spurge', 'Maass', 'Whiskerd', 'Beamish', 'Danilovitch', 'Baradel', 'Lundbech',
+    'Ivanova', 'Petrov', 'Sidorova', 'Smirnov', 'Kuznetsova', 'Popov', 'Volkova', 'Sokolov', 'Lebedeva', 'Kozlov'
+)
+DESCRIPTIONS: tuple = (
+    'Routine check-up', 'Back pain', 'Fast blood type determination', 'Blood contamination symptoms', 'Follow-up'
+)
+TITLES: tuple = ('Blood drive on Saturday at 9am', 'Blood type O+ urgently needed', 'Schedule change', 'Donor day')
+
+SLOT: datetime.timedelta = datetime.timedelta(minutes=30)
+SLOTS_PER_DAY: int = 20
+FIRST_DAY: datetime.datetime = datetime.datetime(2023, 1, 2, 8, 0)
+
+# Tables in foreign key dependency order; derived tables are filled by triggers or by DERIVE_SQL
+TABLES: tuple = (
+    'action_type', 'building', 'room', 'blood_type', 'blood', 'staff_status', 'staff',
+    'patient', 'health_card', 'appointment_type', 'appointment', 'bill', 'announcement', 'action'
+)
+TRIGGERED_TABLES: tuple = ('patient', 'health_card', 'appointment', 'bill', 'announcement')
+IDENTITIES: tuple = (
+    ('patient', 'patient_id'), ('health_card', 'health_card_id'), ('appointment', 'appointment_id'),
+    ('bill', 'bill_id'), ('announcement', 'announcement_id'), ('action', 'action_id')
+)
+
+VITALS_SQL: str = """
+    birth_date = DATE '1940-01-01' + (random() * 25000)::integer,
+    height = round((150 + random() * 50)::numeric, 1),
+    weight = round((45 + random() * 70)::numeric, 2),
+    blood = 1 + floor(random() * 16)::integer"""
+
+DERIVE_SQL: tuple = (
+    """
+    INSERT INTO health_card (patient, description, full_name, birth_date, height, weight, blood, bmi)
+    SELECT v.*, v.weight * 10000 / (v.height * v.height)
+    FROM (
+        SELECT patient_id, 'Blank health card', CONCAT(first_name, ' ', last_name),
+               DATE '1940-01-01' + (random() * 25000)::integer AS birth_date,
+               round((150 + random() * 50)::numeric, 1)::float4 AS height,
+               round((45 + random() * 70)::numeric, 2)::float4 AS weight,
+               1 + floor(random() * 16)::integer AS blood
+        FROM patient
+    ) AS v""",
+    "INSERT INTO bill (issuer, receiver, amount) SELECT doctor, patient, 0 FROM appointment ORDER BY appointment_id",
+    """
+    INSERT INTO action (type, patient_subject, patient_object, staff_subject, staff_object, time)
+    SELECT 'appointment', NULL, patient, doctor, NULL, NOW() FROM appointment
+    UNION ALL
+    SELECT 'bill', NULL, receiver, issuer, NULL, NOW() FROM bill
+    UNION ALL
+    SELECT 'announcement', NULL, NULL, author, NULL, NOW() FROM announcement""",
+    # Same vectors as the tsvector_update_trigger triggers of migration 0009
+    """
+    UPDATE announcement
+    SET search = to_tsvector('pg_catalog.english', COALESCE(title, '') || ' ' || COALESCE(description, ''))""",
+    "UPDATE health_card SET search = to_tsvector('pg_catalog.english', COALESCE(description, ''))",
+)
+
+
+class RowStream(io.TextIOBase):
+    def __init__(self, rows):
+        self._lines = ('\t'.join('\\N' if v is None else self._escape(str(v)) for v in row) + '\n' for row in rows)
+        self._buffer: str = ''
+
+    @staticmethod
+    def _escape(value: str) -> str:
+        if '\\' in value or '\t' in value or '\n' in value or '\r' in value:
+            value = value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+        return value
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> str:
+        chunks, length = [self._buffer], len(self._buffer)
+
+        for line in self._lines:
+            chunks.append(line)
+            length += len(line)
+            if 0 <= size <= length:
+                break
+
+        data = ''.join(chunks)
+        if size < 0:
+            size = len(data)
+
+        self._buffer = data[size:]
+        return data[:size]
+
+
+class Dataset:
+    def __init__(self, scale: float, days: int = 365, seed: int = 0):
+        self.staff = max(10, round(120 * scale))
+        self.patients = max(10, round(600 * scale))
+        self.appointments = max(10, round(700 * scale))
+        self.announcements = max(10, round(600 * scale))
+        self.rooms = min(30000, max(40, round(40 * scale)))
+        self.buildings = max(10, self.rooms // 40)
+        self.days = days
+        self._seed = seed
+
+    def _rng(self, table: str) -> random.Random:
+        return random.Random(f'{self._seed}:{table}')
+
+    @staticmethod
+    def is_admin(staff_id: int) -> bool:
+        return staff_id % 10 == 5
+
+    def doctors(self) -> list[int]:
+        return [i for i in range(1, self.staff + 1) if not self.is_admin(i)]
+
+    def rows(self, table: str):
+        return getattr(self, f'_{table}')(self._rng(table))
+
+    def _action_type(self, rng):
+        return ((name,) for name in ACTION_TYPES)
+
+    def _building(self, rng):
+        return ((i, f'{rng.randint(1, 99999)} {rng.choice(LAST_NAMES)} Street', rng.choice(LAST_NAMES))
+                for i in range(1, self.buildings + 1))
+
+    def _room(self, rng):
+        return ((i, i % self.buildings + 1) for i in range(1, self.rooms + 1))
+
+    def _blood_type(self, rng):
+        return ((name,) for name in BLOOD_TYPES)
+
+    def _blood(self, rng):
+        return ((i + 1, BLOOD_TYPES[i % 8], i >= 8) for i in range(16))
+
+    def _staff_status(self, rng):
+        return (('Admin',), ('Doctor',))
+
+    def _appointment_type(self, rng):
+        return ((name,) for name in APPOINTMENT_TYPES)
+
+    def _staff(self, rng):
+        for i in range(1, self.staff + 1):
+            yield (
+                i, f'staff{i}@bloodbank.test', f'Staff{i:08d}!', rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES),
+                f'1{i:09d}', 'Admin' if self.is_admin(i) else 'Doctor'
+            )
+
+    def _patient(self, rng):
+        for i in range(1, self.patients + 1):
+            yield (
+                i, f'patient{i}@bloodbank.test', f'patient{i}', f'Patient{i:08d}!',
+                rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), f'2{i:09d}'
+            )
+
+    def _appointment(self, rng):
+        # Every slot books `parallel` distinct doctors into `parallel` distinct rooms,
+        # so neither a doctor nor a room is ever double-booked
+        doctors = self.doctors()
+        parallel = min(len(doctors), self.rooms, max(1, math.ceil(self.appointments / (self.days * SLOTS_PER_DAY))))
+        stride = max(1, self.days * SLOTS_PER_DAY // math.ceil(self.appointments / parallel))
+
+        for k in range(self.appointments):
+            slot, j = divmod(k, parallel)
+            day, slot_of_day = divmod(slot * stride, SLOTS_PER_DAY)
+            yield (
+                k + 1, rng.choice(APPOINTMENT_TYPES), rng.randint(1, self.patients),
+                doctors[(j + slot) % len(doctors)], FIRST_DAY + datetime.timedelta(days=day) + slot_of_day * SLOT,
+                j + 1, rng.choice(DESCRIPTIONS)
+            )
+
+    def _announcement(self, rng):
+        return ((i, rng.randint(1, self.staff), rng.choice(TITLES), rng.choice(DESCRIPTIONS))
+                for i in range(1, self.announcements + 1))
+
+
+COLUMNS: dict[str, str] = {
+    'action_type': 'name',
+    'building': 'building_id, address, name',
+    'room': 'room_id, building',
+    'blood_type': 'name',
+    'blood': 'blood_id, type, contaminated',
+    'staff_status': 'name',
+    'staff': 'staff_id, email, password, first_name, last_name, phone, status',
+    'patient': 'patient_id, email, username, password, first_name, last_name, phone',
+    'appointment_type': 'name',
+    'appointment': 'appointment_id, type, patient, doctor, time, room, description',
+    'announcement': 'announcement_id, author, title, description',
+}
+
+
+def seed(connection, dataset: Dataset, fast: bool = True, log=print):
+    with connection.cursor() as cursor:
+        cursor.execute(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE")
+
+        if fast:
+            for table in TRIGGERED_TABLES:
+                cursor.execute(f"ALTER TABLE {table} DISABLE TRIGGER USER")
+
+        for table in TABLES:
+            if table not in COLUMNS:
+                continue
+
+            start = time.perf_counter()
+            cursor.copy_expert(f"COPY {table} ({COLUMNS[table]}) FROM STDIN", RowStream(dataset.rows(table)), 1 << 16)
+            log(f"\t{table:<18} {cursor.rowcount:>12} rows {time.perf_counter() - start:>8.2f} s")
+
+            if table == 'patient' and not fast:
+                cursor.execute(f"UPDATE health_card SET {VITALS_SQL}")
+
+        if fast:
+            start = time.perf_counter()
+            for statement in DERIVE_SQL:
+                cursor.execute(statement)
+            for table in TRIGGERED_TABLES:
+                cursor.execute(f"ALTER TABLE {table} ENABLE TRIGGER USER")
+            log(f"\t{'derived rows':<18} {'':>12}      {time.perf_counter() - start:>8.2f} s")
+
+        for table, column in IDENTITIES:
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence(%s, %s), COALESCE(MAX({column}), 0) + 1, false) FROM {table}",
+                (table, column)
+            )
+
+    connection.commit()
+
+    connection.autocommit = True
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+    connection.autocommit = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replace all data with a synthetic dataset loaded through COPY')
+    parser.add_argument('--scale', type=float, default=1.0, help='1.0 matches the size of sql/fillers')
+    parser.add_argument('--days', type=int, default=365, help='days of booking history to spread appointments over')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--with-triggers', action='store_true', help='let row triggers build derived rows')
+    args = parser.parse_args()
+
+    config: dict = dotenv_values('.env')
+    connection = psycopg2.connect(
+        dbname=config.get('DB_NAME'),
+        user=config.get('USER'),
+        password=config.get('PASSWORD')
+    )
+
+    start = time.perf_counter()
+    seed(connection, Dataset(args.scale, args.days, args.seed), fast=not args.with_triggers)
+    print(f"\tSeeded in {time.perf_counter() - start:.2f} s")
+
+    connection.close()
+
+
+if __name__ == '__main__':
+    main()
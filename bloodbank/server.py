@@ -0,0 +1,33 @@
+import io
+import socketserver
+
+import psycopg2
+
+from bloodbank import Terminal
+from bloodbank.user import User
+
+
+class SessionHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        istream = io.TextIOWrapper(self.rfile, encoding='utf-8')
+        ostream = io.TextIOWrapper(self.wfile, encoding='utf-8', write_through=True)
+        user = User(self.server.terminal, istream, ostream, columns=self.server.columns, files=self.server.files)
+
+        while True:
+            try:
+                user.interact()
+            except (EOFError, ConnectionError):
+                break
+            except (ValueError, TypeError, OSError, psycopg2.Error) as e:
+                ostream.write(f"\t{e}\n")
+
+
+class Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: tuple[str, int], terminal: Terminal, columns: int = 81, files: str = 'files'):
+        super().__init__(address, SessionHandler)
+        self.terminal = terminal
+        self.columns = columns
+        self.files = files
@@ -0,0 +1,68 @@
+import bisect
+import logging
+import threading
+from collections import namedtuple
+
+slow_log = logging.getLogger('bloodbank.slow')
+
+# Upper bounds of the latency buckets, in seconds: 50us doubling up to ~52s
+BOUNDS: tuple = tuple(0.00005 * 2 ** k for k in range(21))
+
+QueryStat = namedtuple('QueryStat', 'command statement calls total_ms mean_ms p50_ms p95_ms p99_ms max_ms')
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets: list[int] = [0] * (len(BOUNDS) + 1)
+        self.calls: int = 0
+        self.total: float = 0.0
+        self.max: float = 0.0
+
+    def add(self, elapsed: float):
+        self.buckets[bisect.bisect_left(BOUNDS, elapsed)] += 1
+        self.calls += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+
+    def percentile(self, q: float) -> float:
+        target, seen = q * self.calls, 0
+
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target and count:
+                return min(BOUNDS[i], self.max) if i < len(BOUNDS) else self.max
+
+        return self.max
+
+
+class QueryStats:
+    def __init__(self, slow_threshold: float = 0.2):
+        self.slow_threshold = slow_threshold
+        self._lock = threading.Lock()
+        self._histograms: dict[tuple[str, str], Histogram] = {}
+
+    def record(self, command: str, statement: str, elapsed: float):
+        with self._lock:
+            histogram = self._histograms.get((command, statement))
+            if histogram is None:
+                histogram = self._histograms[(command, statement)] = Histogram()
+            histogram.add(elapsed)
+
+    def is_slow(self, elapsed: float) -> bool:
+        return elapsed >= self.slow_threshold
+
+    def snapshot(self) -> list[QueryStat]:
+        with self._lock:
+            rows = [
+                QueryStat(
+                    command, statement, h.calls, h.total * 1000, h.total * 1000 / h.calls,
+                    h.percentile(0.50) * 1000, h.percentile(0.95) * 1000, h.percentile(0.99) * 1000, h.max * 1000
+                )
+                for (command, statement), h in self._histograms.items()
+            ]
+
+        return sorted(rows, key=lambda row: row.total_ms, reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
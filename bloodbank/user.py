@@ -1,13 +1,24 @@
+import collections
 import datetime
 import enum
-import os
+import json
+import pathlib
+import shutil
+import sys
 
-from psycopg2.extras import NamedTupleCursor
+import psycopg2
 
 from bloodbank import FetchMode, Announcement
 from bloodbank import Terminal
-from bloodbank import UserCreds, MedicalRecord, Appointment
-from bloodbank import HELP_MSG, MEDICAL_RECORD_MSG, APPOINTMENT_MSG, ANNOUNCEMENT_MSG
+from bloodbank import Session, MedicalRecord, Appointment
+from bloodbank import SYSTEM_ENTRY_MSG, HELP_MSG, MEDICAL_RECORD_MSG, APPOINTMENT_MSG, ANNOUNCEMENT_MSG
+from bloodbank import STATS_HEADER_MSG, STATS_ROW_MSG, ACTION_MSG, REPORT_CELL_MSG
+from bloodbank import PATIENT_MATCH_MSG, HEALTH_CARD_MATCH_MSG
+from bloodbank.cache import REFERENCE
+from bloodbank.export import EXPORTS, export
+from bloodbank.reports import REPORTS
+from bloodbank.schedule import Booking, parse, schedule
+from bloodbank.vitals import Ingest, check, ingest
 
 
 class Status(enum.Enum):
@@ -31,12 +42,55 @@ class Command(enum.Enum):
     S_VIEW_ANNOUNCEMENTS = 's6'
     S_DELETE_ANNOUNCEMENT = 's7'
     S_UPDATE_ANNOUNCEMENT = 's8'
+    S_VIEW_STATS = 's12'
+    S_VIEW_LOGS = 's13'
+    S_VIEW_REPORT = 's14'
+    S_SCHEDULE_APPOINTMENTS = 's15'
+    S_SEARCH_PATIENTS = 's16'
+    S_SEARCH_ANNOUNCEMENTS = 's17'
+    S_SEARCH_HEALTH_CARDS = 's18'
+    S_EXPORT = 's19'
+    S_INGEST_VITALS = 's20'
+    FIND_AVAILABILITY = ('s21', 'p3')
 
+    @classmethod
+    def parse(cls, query: str):
+        return next((c for c in cls if query == c.value or (isinstance(c.value, tuple) and query in c.value)), None)
 
-def _commit(func):
+
+# Command code -> handler, filled by @_handles on the User methods below
+_HANDLERS: dict = {}
+
+
+def _handles(command: Command):
+    def decorator(func):
+        for code in command.value if isinstance(command.value, tuple) else (command.value,):
+            _HANDLERS[code] = func
+        return func
+
+    return decorator
+
+
+def _checkout(func):
     def wrapper(*args, **kwargs):
-        func(*args, **kwargs)
-        args[0].term.connection.commit()
+        with args[0].term.session():
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def _replica(func):
+    # Read-only commands may be served by a replica
+    def wrapper(*args, **kwargs):
+        return args[0].term.read(func, *args, **kwargs)
+
+    return wrapper
+
+
+def _transaction(func):
+    # One short transaction per write command, retried as a whole on serialization failures
+    def wrapper(*args, **kwargs):
+        return args[0].term.atomic(func, *args, **kwargs)
 
     return wrapper
 
@@ -59,18 +113,56 @@ class User:
     WELCOME_BACK_MSG: str = "\tWelcome back, {name}!"
     WELCOME_MSG: str = "\tWelcome, {name}!"
     SIGN_UP_MSG: str = "\tLooks like there's no such user. Would you like to sign up? [y/*]"
-
-    def __init__(self, terminal: Terminal):
+    CREATED_MSG: str = "\tCreated {entity} #{id}"
+    MORE_MSG: str = "\tShow more? [y/*] "
+    WINDOW_MSG: str = "\tFrom, To (dd-mm-yyyy dd-mm-yyyy): "
+    REPORT_MSG: str = "\tReport ({reports}): "
+    SCHEDULE_MSG: str = "\tCSV file (type, patient, doctor, dd-mm-yyyy HH:MM, room[, description[, minutes]]): "
+    REJECTED_MSG: str = "\tLine {line}: {reason}"
+    SCHEDULED_MSG: str = "\tScheduled {accepted} of {total} appointments"
+    SEARCH_MSG: str = "\tSearch for: "
+    EXPORT_MSG: str = "\tExport ({exports}): "
+    FILE_MSG: str = "\tFile (.gz to compress): "
+    EXPORTED_MSG: str = "\tExported {rows} rows to {path}"
+    VITALS_MSG: str = "\tCSV file (patient, weight, height, blood): "
+    INGESTED_MSG: str = "\tApplied {applied} of {received} readings"
+    AVAILABILITY_MSG: str = "\tFrom, To (dd-mm-yyyy dd-mm-yyyy, empty for the next free slot): "
+    SLOT_MSG: str = "\t{start:%d-%m-%Y %H:%M} - {end:%H:%M}"
+    NO_SLOTS_MSG: str = "\tNo free slots"
+    NO_RECORD_MSG: str = "\tNo medical record for patient #{patient_id}"
+    UNKNOWN_MSG: str = "Unknown command {query}"
+    PAGE_SIZE: int = 20
+    FLUSH_EVERY: int = 1000
+    OPENING: datetime.time = datetime.time(8, 0)
+    CLOSING: datetime.time = datetime.time(18, 0)
+    MAX_WINDOW_DAYS: int = 92
+    NEXT_SLOT_DAYS: int = 366
+
+    def __init__(
+            self, terminal: Terminal, istream=None, ostream=None, columns: int | None = None,
+            interactive: bool = True, output: str = 'text', files: str | None = None
+    ):
         self._queries: int = 0
         self._email: str | None = None
         self._password: str | None = None
-        self._status: Status = Status.GUEST
+        self._session: Session | None = None
+        self._profiles: tuple | None = None
         self._terminal: Terminal = terminal
-
-        columns, _ = os.get_terminal_size(0)
+        self._istream = istream or sys.stdin
+        self._ostream = ostream or sys.stdout
+        self._interactive: bool = interactive
+        self._json: bool = output == 'json'
+        self._answers: collections.deque | None = None
+        self._buffer: list[str] = []
+        self._files: pathlib.Path | None = pathlib.Path(files).resolve() if files is not None else None
+
+        if columns is None:
+            columns = shutil.get_terminal_size((81, 24)).columns
         self.HELP_MSG = HELP_MSG.format(padding=' ' * ((columns - 81) // 2 - 4))
 
-        print(self.HELP_MSG)
+        if interactive:
+            self._print(SYSTEM_ENTRY_MSG.format(padding=" " * ((columns - 81) // 2)))
+            self._print(self.HELP_MSG)
 
     @property
     def term(self) -> Terminal:
@@ -86,175 +178,390 @@ class User:
 
     @property
     def status(self) -> Status:
-        return self._status
+        return self._session.status if self._session else Status.GUEST
+
+    def _input(self, prompt: str = '') -> str:
+        # JSON-lines requests carry their answers; scripts put them on the lines after the command
+        if self._answers is not None:
+            if not self._answers:
+                raise ValueError(f'Missing argument: {prompt.strip()}')
+            return self._answers.popleft()
+
+        if self._interactive:
+            self.flush()
+            if self._istream is sys.stdin and self._ostream is sys.stdout:
+                return input(prompt)
+
+            self._ostream.write(prompt)
+            self._ostream.flush()
+
+        line = self._istream.readline()
+
+        if not line:
+            raise EOFError
+        return line.rstrip('\r\n')
+
+    def _print(self, *values):
+        if not self._json:
+            self._buffer.append(' '.join(map(str, values)) + '\n')
+        elif any(str(value).strip() for value in values):
+            self._emit({'message': ' '.join(str(value).strip() for value in values)})
+
+    def _emit(self, record, text: str | None = None):
+        # One result record: box-drawing text for people, one JSON object per line for scripts
+        if self._json:
+            record = record._asdict() if hasattr(record, '_asdict') else record
+            self._buffer.append(json.dumps(record, default=str) + '\n')
+        elif text is not None:
+            self._buffer.append(text + '\n')
+
+    def _path(self, name: str) -> str:
+        # Remote sessions name files relative to the server's files directory and cannot leave it
+        if self._files is None:
+            return name
+
+        path = (self._files / name).resolve()
+        if name == '-' or not path.is_relative_to(self._files):
+            raise PermissionError(f'Access denied to {name}!')
+        return str(path)
+
+    def flush(self):
+        if self._buffer:
+            self._ostream.write(''.join(self._buffer))
+            self._buffer.clear()
+        self._ostream.flush()
 
     @_requires_auth(statuses=(Status.PATIENT, Status.STAFF, Status.ADMIN))
     def full_name(self) -> str:
-        query: str = f"""
-        SELECT CONCAT(first_name, ' ', last_name) as full_name
-        FROM {self.status.value}
-        WHERE email=%s AND password=%s
-        """
-
-        with self.term.connection.cursor(cursor_factory=NamedTupleCursor) as cursor:
-            cursor.execute(query, (self.email, self.password))
-            response = cursor.fetchone()
-
-        return response.full_name
+        return self._session.full_name
 
+    @_requires_auth(statuses=(Status.PATIENT, Status.STAFF, Status.ADMIN))
     def id(self) -> int:
-        query: str = f"""
-        SELECT {self.status.value}_id
-        FROM {'patient' if self.status == Status.PATIENT else 'staff'}
-        WHERE email=%s AND password=%s
-        """
-
-        with self.term.connection.cursor() as cursor:
-            cursor.execute(query, (self.email, self.password))
-            response = cursor.fetchone()
-
-        return int(response[0])
+        return self._session.id
 
     def interact(self):
-        query: str = input(f"    ~ ({self.email if self.status != Status.GUEST else 'Guest'}): ")
-
-        # Authorize into system
-        if query == Command.AUTHENTICATE.value:
-            if self._authenticate(*input(self.AUTH_MSG).split()):
-                print(self.WELCOME_BACK_MSG.format(name=self.full_name()))
-            elif (input(self.SIGN_UP_MSG) == 'y' and self._sign_up(*input("\tEmail, username, password, first_name, "
-                                                                          "last_name, phone: ").split())):
-                print(self.WELCOME_MSG.format(name=self.full_name()))
-
-        # Print help message
-        elif query == Command.HELP.value:
-            print(self.HELP_MSG)
-
-        # View your medical record
-        elif query == Command.P_VIEW_MEDICAL_RECORD.value and self.status == Status.PATIENT:
-            self._get_medical_record()
+        query: str = self._input(f"    ~ ({self.email if self.status != Status.GUEST else 'Guest'}): ")
 
-        # View patient's medical record
-        elif query == Command.S_VIEW_MEDICAL_RECORD.value and self.status in (Status.STAFF, Status.ADMIN):
-            self._get_medical_record(int(input("    Patient's ID: ")))
+        try:
+            self.run(query)
+        finally:
+            self.flush()
 
-        # Create appointment
-        elif query == Command.S_CREATE_APPOINTMENT.value:
-            app_type = input("\tType of the appointment (refer to help if needed): ")
-            desc = input("\tDescription: ")
-            patient_id, room_id = input("\tPatient ID, Room: ").split()
-            timestamp = datetime.datetime.strptime(input("\tDate & time (dd-mm-yyyy HH:MM): "), '%d-%m-%Y %H:%M')
-
-            self._create_appointment(app_type, patient_id, timestamp, room_id, desc)
-
-        # View appointments
-        elif query in Command.VIEW_APPOINTMENTS.value:
-            self._get_appointments()
-
-        # Delete a specific appointment
-        elif query == Command.S_DELETE_APPOINTMENT.value:
-            self._delete_appointment(input("    Appointment ID: "))
-
-        # Update a specific appointment
-        elif query == Command.S_UPDATE_APPOINTMENT.value:
-            app_id = input("\tAppointment ID: ")
-            desc = input("\tDescription: ")
-            room_id = input("\tRoom: ")
-            timestamp = datetime.datetime.strptime(input("\tDate & time (dd-mm-yyyy HH:MM): "), '%d-%m-%Y %H:%M')
+    def run(self, query: str) -> bool:
+        handler = _HANDLERS.get(query)
+        if handler is None:
+            return False
 
-            self._update_appointment(app_id, desc, room_id, timestamp)
+        if self._session is not None and self._profiles != self._profile_versions():
+            self._reload_session()
 
-        elif query == Command.S_CREATE_ANNOUNCEMENT.value:
-            title = input("\tTitle: ")
-            desc = input("\tDescription: ")
+        with self.term.command(Command.parse(query).name):
+            handler(self)
 
-            self._create_announcement(title, desc)
+        self._queries += self.term.queries
+        return True
 
-        elif query == Command.S_VIEW_ANNOUNCEMENTS.value:
-            self._get_announcements()
+    def batch(self, stream=None):
+        # Each line is either a command code whose answers follow on the next lines, or a JSON object
+        # {"command": "s1", "args": [...]}; a failing command is reported and the batch goes on
+        self._istream = stream or self._istream
+        count = 0
+
+        try:
+            for line in iter(self._istream.readline, ''):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+
+                try:
+                    if line.startswith('{'):
+                        request = json.loads(line)
+                        line, self._answers = request['command'], collections.deque(map(str, request.get('args', ())))
+
+                    if not self.run(line):
+                        raise LookupError(self.UNKNOWN_MSG.format(query=line))
+                except (PermissionError, LookupError, ValueError, TypeError, OSError, psycopg2.Error) as e:
+                    self._emit({'command': line, 'error': str(e)}, f"\t{e}")
+                except EOFError:
+                    self._emit({'command': line, 'error': 'unexpected end of input'}, "\tUnexpected end of input")
+                    break
+                finally:
+                    self._answers = None
+
+                count += 1
+                if count % self.FLUSH_EVERY == 0:
+                    self.flush()
+        finally:
+            # Whatever ends the batch, the results of the commands that ran are not lost
+            self.flush()
+
+    # Authorize into system
+    @_handles(Command.AUTHENTICATE)
+    def _on_authenticate(self):
+        if self._authenticate(*self._input(self.AUTH_MSG).split()):
+            self._print(self.WELCOME_BACK_MSG.format(name=self.full_name()))
+        elif (self._input(self.SIGN_UP_MSG) == 'y' and
+              self._sign_up(*self._input("\tEmail, username, password, first_name, last_name, phone: ").split())):
+            self._print(self.WELCOME_MSG.format(name=self.full_name()))
+
+    # Print help message
+    @_handles(Command.HELP)
+    def _on_help(self):
+        self._print(self.HELP_MSG)
+
+    # View your medical record
+    @_handles(Command.P_VIEW_MEDICAL_RECORD)
+    def _on_view_own_medical_record(self):
+        if self.status == Status.PATIENT:
+            self._get_medical_record()
 
-        elif query == Command.S_DELETE_ANNOUNCEMENT.value:
-            self._delete_announcement(input("    Announcement ID: "))
+    # Update your medical record; empty answers keep the stored values
+    @_handles(Command.P_UPDATE_MEDICAL_RECORD)
+    def _on_update_own_medical_record(self):
+        if self.status != Status.PATIENT:
+            return
+
+        desc = self._input("\tDescription: ") or None
+        blood = self._input("\tBlood ID: ")
+        weight = self._input("\tWeight (kg): ")
+        height = self._input("\tHeight (cm): ")
+        birth_date = self._input("\tBirth date (dd-mm-yyyy): ")
+
+        self._update_medical_record(
+            desc, int(blood) if blood else None, float(weight) if weight else None, float(height) if height else None,
+            datetime.datetime.strptime(birth_date, '%d-%m-%Y') if birth_date else None
+        )
 
-        elif query == Command.S_UPDATE_ANNOUNCEMENT.value:
-            app_id = input("\tAnnouncement ID: ")
-            title = input("\tTitle: ")
-            desc = input("\tDescription: ")
-            
-            self._update_announcement(app_id, title, desc)
+    # View patient's medical record
+    @_handles(Command.S_VIEW_MEDICAL_RECORD)
+    def _on_view_medical_record(self):
+        if self.status in (Status.STAFF, Status.ADMIN):
+            self._get_medical_record(int(self._input("    Patient's ID: ")))
+
+    # Create appointment
+    @_handles(Command.S_CREATE_APPOINTMENT)
+    def _on_create_appointment(self):
+        types = [row.name for row in self._reference('appointment_type')]
+        app_type = self._input(f"\tType of the appointment ({', '.join(types)}): ")
+        if app_type not in types:
+            raise ValueError(f'Unknown appointment type {app_type}!')
+
+        desc = self._input("\tDescription: ")
+        patient_id, room_id = self._input("\tPatient ID, Room: ").split()
+        if int(room_id) not in {row.room_id for row in self._reference('room')}:
+            raise ValueError(f'Unknown room {room_id}!')
+
+        timestamp = datetime.datetime.strptime(self._input("\tDate & time (dd-mm-yyyy HH:MM): "), '%d-%m-%Y %H:%M')
+
+        appointment = self._create_appointment(app_type, patient_id, timestamp, room_id, desc)
+        self._emit(appointment, self.CREATED_MSG.format(entity='appointment', id=str(appointment.appointment_id).zfill(5)))
+
+    # View appointments
+    @_handles(Command.VIEW_APPOINTMENTS)
+    def _on_view_appointments(self):
+        self._get_appointments()
+
+    # Delete a specific appointment
+    @_handles(Command.S_DELETE_APPOINTMENT)
+    def _on_delete_appointment(self):
+        self._delete_appointment(self._input("    Appointment ID: "))
+
+    # Update a specific appointment
+    @_handles(Command.S_UPDATE_APPOINTMENT)
+    def _on_update_appointment(self):
+        app_id = self._input("\tAppointment ID: ")
+        desc = self._input("\tDescription: ")
+        room_id = self._input("\tRoom: ")
+        timestamp = datetime.datetime.strptime(self._input("\tDate & time (dd-mm-yyyy HH:MM): "), '%d-%m-%Y %H:%M')
+
+        self._update_appointment(app_id, desc, room_id, timestamp)
+
+    # Book a whole roster at once; overlapping doctor or room bookings are rejected per row
+    @_handles(Command.S_SCHEDULE_APPOINTMENTS)
+    def _on_schedule_appointments(self):
+        with open(self._path(self._input(self.SCHEDULE_MSG)), newline='') as file:
+            bookings = self._schedule_appointments(file)
+
+        for booking in bookings:
+            if booking.reason or self._json:
+                self._emit(booking, self.REJECTED_MSG.format(line=booking.line, reason=booking.reason))
+
+        accepted = sum(1 for booking in bookings if booking.reason is None)
+        self._print(self.SCHEDULED_MSG.format(accepted=accepted, total=len(bookings)))
+
+    @_handles(Command.S_CREATE_ANNOUNCEMENT)
+    def _on_create_announcement(self):
+        title = self._input("\tTitle: ")
+        desc = self._input("\tDescription: ")
+
+        announcement = self._create_announcement(title, desc)
+        self._emit(
+            announcement, self.CREATED_MSG.format(entity='announcement', id=str(announcement.announcement_id).zfill(5))
+        )
 
+    @_handles(Command.S_VIEW_ANNOUNCEMENTS)
+    def _on_view_announcements(self):
+        self._get_announcements()
+
+    @_handles(Command.S_SEARCH_ANNOUNCEMENTS)
+    def _on_search_announcements(self):
+        self._search_announcements(self._input(self.SEARCH_MSG))
+
+    @_handles(Command.S_DELETE_ANNOUNCEMENT)
+    def _on_delete_announcement(self):
+        self._delete_announcement(self._input("    Announcement ID: "))
+
+    @_handles(Command.S_UPDATE_ANNOUNCEMENT)
+    def _on_update_announcement(self):
+        app_id = self._input("\tAnnouncement ID: ")
+        title = self._input("\tTitle: ")
+        desc = self._input("\tDescription: ")
+
+        self._update_announcement(app_id, title, desc)
+
+    # Find patients by part of their name, email or phone
+    @_handles(Command.S_SEARCH_PATIENTS)
+    def _on_search_patients(self):
+        self._search_patients(self._input(self.SEARCH_MSG))
+
+    @_handles(Command.S_SEARCH_HEALTH_CARDS)
+    def _on_search_health_cards(self):
+        self._search_health_cards(self._input(self.SEARCH_MSG))
+
+    # Apply a clinic's device readings in one validated batch
+    @_handles(Command.S_INGEST_VITALS)
+    def _on_ingest_vitals(self):
+        with open(self._path(self._input(self.VITALS_MSG)), newline='') as file:
+            result = self._ingest_vitals(file)
+
+        for line, reason in result.rejected:
+            self._emit({'line': line, 'reason': reason}, self.REJECTED_MSG.format(line=line, reason=reason))
+        self._print(self.INGESTED_MSG.format(applied=result.applied, received=result.received))
+
+    # Free slots of a type's length for a doctor and/or room, or the next free one when no range is given
+    @_handles(Command.FIND_AVAILABILITY)
+    def _on_find_availability(self):
+        types = {row.name: row.duration for row in self._reference('appointment_type')}
+        app_type = self._input(f"\tType of the appointment ({', '.join(types)}): ")
+        if app_type not in types:
+            raise ValueError(f'Unknown appointment type {app_type}!')
+
+        doctor = self._input("\tDoctor ID (empty for any): ")
+        room = self._input("\tRoom (empty for any): ")
+        window = self._input(self.AVAILABILITY_MSG).split()
+
+        doctor, room, length = int(doctor) if doctor else None, int(room) if room else None, types[app_type]
+        if window:
+            start, end = (datetime.datetime.strptime(d, '%d-%m-%Y').date() for d in window)
+            if not 0 <= (end - start).days < self.MAX_WINDOW_DAYS:
+                raise ValueError(f'The range must cover 1 to {self.MAX_WINDOW_DAYS} days!')
+            slots = self._available_slots([start + datetime.timedelta(days=i) for i in range((end - start).days + 1)],
+                                          length, doctor, room)
+        else:
+            slots = self._next_slot(length, doctor, room)
+
+        if not slots:
+            self._print(self.NO_SLOTS_MSG)
+        for slot in slots:
+            self._emit({'start': slot, 'end': slot + length, 'doctor': doctor, 'room': room},
+                       self.SLOT_MSG.format(start=slot, end=slot + length))
+
+    # Dump per-command query statistics
+    @_handles(Command.S_VIEW_STATS)
+    def _on_view_stats(self):
+        self._get_stats()
+
+    # View the logs journal for a time window
+    @_handles(Command.S_VIEW_LOGS)
+    def _on_view_logs(self):
+        start, end = (datetime.datetime.strptime(d, '%d-%m-%Y') for d in self._input(self.WINDOW_MSG).split())
+        self._get_logs(start, end)
+
+    # View a precomputed report
+    @_handles(Command.S_VIEW_REPORT)
+    def _on_view_report(self):
+        self._get_report(self._input(self.REPORT_MSG.format(reports=', '.join(REPORTS))))
+
+    # Stream a date range of appointments, bills or actions to a CSV file
+    @_handles(Command.S_EXPORT)
+    def _on_export(self):
+        name = self._input(self.EXPORT_MSG.format(exports=', '.join(EXPORTS)))
+        start, end = (datetime.datetime.strptime(d, '%d-%m-%Y') for d in self._input(self.WINDOW_MSG).split())
+        path = self._path(self._input(self.FILE_MSG))
+
+        rows = self._export(name, start, end, path)
+        self._emit({'export': name, 'rows': rows, 'path': path}, self.EXPORTED_MSG.format(rows=rows, path=path))
+
+    @staticmethod
+    def _to_session(resp) -> Session | None:
+        if not resp:
+            return None
+
+        if resp.kind == 'patient':
+            status = Status.PATIENT
+        else:
+            status = (Status.STAFF, Status.ADMIN)[resp.status == 'Admin']
+
+        return Session(resp.id, resp.email, status, resp.full_name)
+
+    def _profile_versions(self) -> tuple:
+        return self.term.cache.version('staff'), self.term.cache.version('patient')
+
+    @_checkout
     def _authenticate(self, email: str, password: str) -> bool:
-        staff_query: str = """
-        SELECT email, password, status FROM staff
-        WHERE email=%s AND password=%s"""
-
-        patient_query: str = """
-        SELECT email, password FROM patient
-        WHERE email=%s AND password=%s"""
-
-        with self.term.connection.cursor(cursor_factory=NamedTupleCursor) as cursor:
-            cursor.execute(staff_query, (email, password))
-            staff_resp: UserCreds = cursor.fetchone()
-
-            cursor.execute(patient_query, (email, password))
-            patient_resp: UserCreds = cursor.fetchone()
-
-            if staff_resp:
-                self._email = staff_resp.email
-                self._password = staff_resp.password
-                self._status = (Status.STAFF, Status.ADMIN)[staff_resp.status == 'Admin']
-            elif patient_resp:
-                self._email = patient_resp.email
-                self._password = patient_resp.password
-                self._status = Status.PATIENT
-
-        return self._status is not Status.GUEST
-
-    @_commit
+        profiles = self._profile_versions()
+        session = self._to_session(self.term.execute('authenticate', FetchMode.ONE, email, password))
+
+        if session:
+            self._email = session.email
+            self._password = password
+            self._session = session
+            self._profiles = profiles
+
+        return self._session is not None
+
+    @_checkout
+    def _reload_session(self):
+        # A staff/patient NOTIFY arrived since the session was resolved: status, name or credentials may have
+        # changed, so it is resolved again; a session whose credentials no longer match ends
+        self._profiles = self._profile_versions()
+        self._session = self._to_session(self.term.execute('authenticate', FetchMode.ONE, self._email, self._password))
+        if self._session is None:
+            self._email = self._password = None
+
+    @_checkout
+    @_transaction
     def _sign_up(
             self, email: str, username: str | None,
             password: str, first_name: str,
             last_name: str, phone: str | None
     ) -> bool:
-        last_id = self.term.execute_query(
-            "SELECT patient_id from patient ORDER BY patient_id DESC",
-            mode=FetchMode.ONE
-        ).patient_id
-
-        query: str = """
-        INSERT INTO patient (patient_id, email, username, password, first_name, last_name, phone)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)"""
-
-        response: UserCreds = self.term.execute_query(
-            query, FetchMode.ONE,
-            last_id + 1, email, username, password, first_name, last_name, phone)
+        response = self.term.execute(
+            'sign_up', FetchMode.ONE,
+            email, username, password, first_name, last_name, phone)
 
         if not response:
             return False
 
         self._email = email
         self._password = password
-        self._status = Status.PATIENT
+        self._session = Session(response.patient_id, email, Status.PATIENT, f'{first_name} {last_name}')
+        self._profiles = self._profile_versions()
 
         return True
 
+    @_replica
     @_requires_auth(statuses=(Status.PATIENT, Status.STAFF, Status.ADMIN))
     def _get_medical_record(self, patient_id: int | None = None):
-        query: str = f"""
-        SELECT
-            health_card_id AS record_id,
-            patient AS patient_id,
-            CONCAT(sup.first_name, ' ', sup.last_name) AS full_name,
-            description AS info,
-            birth_date, height, weight, bmi
-        FROM health_card
-        JOIN patient AS sup
-        ON patient_id=patient
-        WHERE patient={self.id() if not patient_id else patient_id}"""
-
-        resp: MedicalRecord = self.term.execute_query(query, FetchMode.ONE)
-
-        print(MEDICAL_RECORD_MSG.format(
+        patient_id = patient_id or self.id()
+        resp: MedicalRecord = self.term.execute('medical_record', FetchMode.ONE, patient_id)
+
+        if resp is None:
+            self._emit({'patient_id': patient_id, 'record': None},
+                       self.NO_RECORD_MSG.format(patient_id=str(patient_id).zfill(4)))
+            return
+
+        self._emit(resp, MEDICAL_RECORD_MSG.format(
             record_id=str(resp.record_id).zfill(4),
             patient_id=str(resp.patient_id).zfill(4),
             full_name=resp.full_name,
@@ -265,29 +572,99 @@ class User:
             info=resp.info
         ))
 
+    @_checkout
+    def _reference(self, table: str) -> list:
+        # Whole small lookup table, served from the cache until its NOTIFY arrives or the TTL runs out
+        return self.term.cache.get(table, None, lambda: self.term.execute(REFERENCE[table], FetchMode.ALL))
+
+    @_checkout
+    def _names(self, table: str, ids) -> dict:
+        # Display names by id for 'staff' or 'patient'; one query for all the misses
+        query = 'staff_names' if table == 'staff' else 'patient_names'
+        return self.term.cache.get_many(table, {i for i in ids if i is not None}, lambda missing: {
+            row.id: row.full_name for row in self.term.execute(query, FetchMode.ALL, missing)
+        })
+
+    @_checkout
+    @_requires_auth(statuses=(Status.PATIENT, Status.STAFF, Status.ADMIN))
+    def _available_slots(self, days: list, length: datetime.timedelta, doctor: int | None, room: int | None) -> list:
+        # Cached per day; the appointment triggers NOTIFY 'availability:<day>' for every day a write touches
+        keys = [(day.isoformat(), doctor, room, length) for day in days]
+        found = self.term.cache.get_many('availability', keys, self._load_slots)
+        return [slot for key in keys for slot in found[key]]
+
+    def _load_slots(self, keys: list) -> dict:
+        # All missing days in one query; days without a free slot are cached as empty too
+        _, doctor, room, length = keys[0]
+        slots = {key: [] for key in keys}
+        days = [datetime.date.fromisoformat(key[0]) for key in keys]
+
+        rows = self.term.execute('available_slots', FetchMode.ALL, days, self.OPENING, self.CLOSING, length, doctor, room)
+        for row in rows:
+            slots[(row.slot.date().isoformat(), doctor, room, length)].append(row.slot)
+        return slots
+
+    def _next_slot(self, length: datetime.timedelta, doctor: int | None, room: int | None) -> list:
+        # A week per query from today on; the probes only touch appointments near each slot, so history is free
+        now = datetime.datetime.now()
+
+        for week in range(0, self.NEXT_SLOT_DAYS, 7):
+            days = [now.date() + datetime.timedelta(days=week + i) for i in range(7)]
+            slot = next((slot for slot in self._available_slots(days, length, doctor, room) if slot >= now), None)
+            if slot is not None:
+                return [slot]
+        return []
+
+    @_checkout
+    @_transaction
+    @_requires_auth(statuses=(Status.PATIENT,))
+    def _update_medical_record(self, desc, blood, weight, height, birth_date):
+        reason = check(weight, height, blood)
+        stored: MedicalRecord | None = self.term.execute('medical_record', FetchMode.ONE, self.id())
+        if not reason and stored is not None and (weight is None) != (height is None):
+            reason = check(
+                stored.weight if weight is None else weight, stored.height if height is None else height, None
+            )
+        if reason:
+            raise ValueError(f'Rejected: {reason}!')
+
+        query: str = "CALL update_health_record(%s::integer, %s::text, %s::smallint, %s::real, %s::real, %s::timestamptz)"
+        self.term.execute_query(query, FetchMode.NONE, self.id(), desc, blood, weight, height, birth_date)
+
+    @_checkout
+    @_transaction
+    @_requires_auth((Status.STAFF, Status.ADMIN))
+    def _ingest_vitals(self, lines) -> Ingest:
+        return ingest(self.term.connection, lines)
+
+    def _paginate(self, name: str, values: tuple, first_key: tuple, key, enrich=None):
+        # Keyset pagination: each page is one indexed range scan starting after the previous page's last key,
+        # and no connection is held while the user decides whether to continue
+        after = first_key
+
+        while True:
+            # A page whose replica fails is fetched again from the primary
+            page = self.term.read(self.term.execute, name, FetchMode.ALL, *values, *after, self.PAGE_SIZE)
+
+            # Cache misses are loaded from the primary, so a replica that is behind never fills the cache
+            yield from enrich(page) if enrich and page else page
+
+            if len(page) < self.PAGE_SIZE or (self._interactive and self._input(self.MORE_MSG) != 'y'):
+                return
+            after = key(page[-1])
+
     @_requires_auth(statuses=(Status.PATIENT, Status.STAFF, Status.ADMIN))
     def _get_appointments(self):
-        query: str = f"""
-        SELECT 
-            a.appointment_id,
-            a.time,
-            a.description,
-            a.room,
-            a.type,
-            CONCAT(p.first_name, ' ', p.last_name) AS patient,
-            CONCAT(s.first_name, ' ', s.last_name) AS doctor
-        FROM appointment  a
-        JOIN staff s ON s.staff_id = a.doctor
-        JOIN patient p ON a.patient = p.patient_id
-        WHERE {self.status.value if self.status != Status.STAFF else 'doctor'}={self.id()}
-        ORDER BY a.time"""
-
-        with self.term.connection.cursor(cursor_factory=NamedTupleCursor) as cursor:
-            cursor.execute(query)
-            responses: list[Appointment] = cursor.fetchall()
+        name = 'patient_appointments' if self.status == Status.PATIENT else 'doctor_appointments'
+        responses = self._paginate(
+            name, (self.id(),),
+            first_key=(datetime.datetime.min, 0),
+            key=lambda resp: (resp.time, resp.appointment_id),
+            enrich=self._with_names
+        )
 
         for resp in responses:
-            print(APPOINTMENT_MSG.format(
+            self._emit(resp, APPOINTMENT_MSG.format(
                 appointment_id=str(resp.appointment_id).zfill(5),
                 type=resp.type,
                 patient_id=str(resp.patient).zfill(4),
@@ -295,10 +672,18 @@ class User:
                 time=str(resp.time),
                 room=resp.room,
                 info=resp.description
-            ))
-            print()
+            ) + '\n')
+
+    def _with_names(self, page: list) -> list:
+        patients = self._names('patient', (row.patient for row in page))
+        doctors = self._names('staff', (row.doctor for row in page))
 
-    @_commit
+        return [
+            row._replace(patient=patients.get(row.patient, ''), doctor=doctors.get(row.doctor, '')) for row in page
+        ]
+
+    @_checkout
+    @_transaction
     @_requires_auth((Status.STAFF, Status.ADMIN))
     def _create_appointment(
             self,
@@ -307,81 +692,176 @@ class User:
             time,
             room,
             description=None
-    ):
-        last_id = self.term.execute_query(
-            "SELECT appointment_id from appointment ORDER BY appointment_id DESC",
-            mode=FetchMode.ONE
-        ).appointment_id
-
-        query: str = """
-        INSERT INTO appointment (appointment_id, type, patient, doctor, time, room, description)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)"""
-
-        self.term.execute_query(
-            query, FetchMode.NONE,
-            last_id + 1, appointment_type, patient_id, self.id(), time, room, description
+    ) -> Appointment:
+        appointment = self.term.execute(
+            'create_appointment', FetchMode.ONE,
+            appointment_type, patient_id, self.id(), time, room, description
         )
+        # The duration comes from the type's row, so an unknown type inserts nothing
+        if appointment is None:
+            raise ValueError(f'Unknown appointment type {appointment_type}!')
+        return appointment
 
-    @_commit
+    @_checkout
+    @_transaction
     @_requires_auth((Status.STAFF, Status.ADMIN))
     def _delete_appointment(self, appointment_id: int):
-        query: str = """
-        DELETE FROM appointment
-        WHERE appointment_id=%s"""
+        self.term.execute('delete_appointment', FetchMode.NONE, appointment_id)
 
-        self.term.execute_query(query, FetchMode.NONE, appointment_id)
+    @_checkout
+    @_transaction
+    @_requires_auth((Status.STAFF, Status.ADMIN))
+    def _schedule_appointments(self, lines) -> list[Booking]:
+        return schedule(self.term.connection, parse(lines, self.id()))
 
+    @_checkout
+    @_transaction
+    @_requires_auth((Status.STAFF, Status.ADMIN))
     def _update_appointment(self, app_id, desc, room_id, timestamp):
         query: str = "CALL update_appointment(%s::integer, %s::text, %s::integer, %s::timestamp without time zone)"
         self.term.execute_query(query, FetchMode.NONE, app_id, desc, room_id, timestamp, )
 
+    @_checkout
+    @_transaction
     @_requires_auth((Status.STAFF, Status.ADMIN))
-    def _create_announcement(self, title, description):
-        last_id = self.term.execute_query(
-            "SELECT announcement_id from announcement ORDER BY announcement_id DESC",
-            mode=FetchMode.ONE
-        ).announcement_id
-
-        query: str = """
-        INSERT INTO announcement (announcement_id, title, description, author)
-        VALUES (%s, %s, %s, %s)"""
-
-        self.term.execute_query(
-            query, FetchMode.NONE,
-            last_id + 1, title, description, self.id()
+    def _create_announcement(self, title, description) -> Announcement:
+        return self.term.execute(
+            'create_announcement', FetchMode.ONE,
+            title, description, self.id()
         )
 
     @_requires_auth(statuses=(Status.PATIENT, Status.STAFF, Status.ADMIN))
     def _get_announcements(self):
-        query: str = f"""
-        SELECT 
-            announcement_id,
-            title,
-            email AS author,
-            description
-        FROM announcement
-        JOIN staff ON staff_id = author
-        WHERE author=%s"""
-
-        responses: list[Announcement] = self.term.execute_query(query, FetchMode.ALL, self.id())
+        responses = self._paginate(
+            'author_announcements', (self.id(),),
+            first_key=(0,),
+            key=lambda resp: (resp.announcement_id,)
+        )
 
         for resp in responses:
-            print(ANNOUNCEMENT_MSG.format(
+            # Only the user's own announcements are listed
+            resp = resp._replace(author=self.email)
+            self._emit(resp, ANNOUNCEMENT_MSG.format(
                 announcement_id=str(resp.announcement_id).zfill(5),
                 title=resp.title,
                 author=resp.author,
                 description=resp.description
-            ))
-            print()
+            ) + '\n')
+
+    def _with_authors(self, page: list) -> list:
+        authors = self._names('staff', (row.author for row in page))
+        return [row._replace(author=authors.get(row.author, '')) for row in page]
+
+    @_requires_auth((Status.STAFF, Status.ADMIN))
+    def _search_announcements(self, text: str):
+        responses = self._paginate(
+            'search_announcements', (text,),
+            first_key=(float('inf'), 0),
+            key=lambda resp: (resp.rank, resp.announcement_id),
+            enrich=self._with_authors
+        )
 
-    @_commit
+        for resp in responses:
+            self._emit(resp, ANNOUNCEMENT_MSG.format(
+                announcement_id=str(resp.announcement_id).zfill(5),
+                title=resp.title,
+                author=resp.author,
+                description=resp.description
+            ) + '\n')
+
+    @_checkout
+    @_transaction
     @_requires_auth((Status.ADMIN,))
     def _delete_announcement(self, announcement_id: int):
-        query: str = """DELETE FROM announcement WHERE announcement_id=%s"""
-
-        self.term.execute_query(query, FetchMode.NONE, announcement_id)
+        self.term.execute('delete_announcement', FetchMode.NONE, announcement_id)
 
+    @_checkout
+    @_transaction
     @_requires_auth((Status.ADMIN,))
     def _update_announcement(self, announcement_id, title, desc):
-        query: str = "CALL update_appointment(%s::integer, %s::text, %s::text)"
+        query: str = "CALL update_announcement(%s::integer, %s::text, %s::text)"
         self.term.execute_query(query, FetchMode.NONE, announcement_id, title, desc)
+
+    @_requires_auth((Status.STAFF, Status.ADMIN))
+    def _search_patients(self, text: str):
+        pattern = '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        responses = self._paginate(
+            'search_patients', (text, pattern),
+            first_key=(float('inf'), 0),
+            key=lambda resp: (resp.rank, resp.patient_id)
+        )
+
+        for resp in responses:
+            self._emit(resp, PATIENT_MATCH_MSG.format(
+                rank=resp.rank, patient_id=resp.patient_id, full_name=resp.full_name,
+                email=resp.email or '-', phone=resp.phone or '-'
+            ))
+
+    @_requires_auth((Status.STAFF, Status.ADMIN))
+    def _search_health_cards(self, text: str):
+        responses = self._paginate(
+            'search_health_cards', (text,),
+            first_key=(float('inf'), 0),
+            key=lambda resp: (resp.rank, resp.record_id)
+        )
+
+        for resp in responses:
+            self._emit(resp, HEALTH_CARD_MATCH_MSG.format(
+                rank=resp.rank, record_id=resp.record_id, patient_id=resp.patient_id, info=resp.info
+            ))
+
+    @_requires_auth((Status.ADMIN,))
+    def _get_stats(self):
+        if not self._json:
+            self._print(STATS_HEADER_MSG.format(
+                command='COMMAND', statement='STATEMENT', calls='CALLS', total='TOTAL ms',
+                mean='MEAN', p50='P50', p95='P95', p99='P99', max='MAX'
+            ))
+
+        for row in self.term.stats.snapshot():
+            self._emit(row, STATS_ROW_MSG.format(
+                command=row.command, statement=row.statement, calls=row.calls, total=row.total_ms,
+                mean=row.mean_ms, p50=row.p50_ms, p95=row.p95_ms, p99=row.p99_ms, max=row.max_ms
+            ))
+
+    @_requires_auth((Status.ADMIN,))
+    def _get_logs(self, start: datetime.datetime, end: datetime.datetime):
+        # Only the partitions overlapping [start, end) are scanned
+        responses = self._paginate(
+            'action_log', (start, end),
+            first_key=(datetime.datetime.min, 0),
+            key=lambda resp: (resp.time, resp.action_id)
+        )
+
+        for resp in responses:
+            subject = f'staff #{resp.staff_subject}' if resp.staff_subject else f'patient #{resp.patient_subject}'
+            obj = f'staff #{resp.staff_object}' if resp.staff_object else f'patient #{resp.patient_object}'
+
+            self._emit(resp, ACTION_MSG.format(
+                action_id=resp.action_id,
+                time=str(resp.time),
+                type=resp.type,
+                subject=subject if resp.staff_subject or resp.patient_subject else '-',
+                object=obj if resp.staff_object or resp.patient_object else '-'
+            ))
+
+    @_replica
+    @_requires_auth((Status.ADMIN,))
+    def _get_report(self, name: str):
+        if name not in REPORTS:
+            raise ValueError(f'Unknown report {name}!')
+
+        view, order = REPORTS[name]
+        header = False
+
+        for row in self.term.execute_query(f"SELECT * FROM {view} ORDER BY {order}", FetchMode.MANY):
+            if not header and not self._json:
+                self._print('        ' + ''.join(REPORT_CELL_MSG.format(value=field.upper()) for field in row._fields))
+                header = True
+
+            self._emit(row, '        ' + ''.join(REPORT_CELL_MSG.format(value=str(value)) for value in row))
+
+    @_replica
+    @_requires_auth((Status.ADMIN,))
+    def _export(self, name: str, start: datetime.datetime, end: datetime.datetime, path: str) -> int:
+        return export(self.term, name, start, end, path)
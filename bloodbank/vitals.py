@@ -0,0 +1,162 @@
+import csv
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:  # only bulk validation needs numpy; single updates do not
+    np = None
+
+from bloodbank.seed import RowStream
+
+Ingest = namedtuple('Ingest', 'received applied rejected')
+
+WEIGHT: tuple = (2.0, 400.0)
+HEIGHT: tuple = (40.0, 250.0)
+BMI: tuple = (10.0, 80.0)
+BLOOD: tuple = (1, 16)
+
+# Reasons shared by check() and validate(), so a single update and a batch reject alike
+UNKNOWN_PATIENT: str = 'unknown patient'
+WEIGHT_OUTSIDE: str = f'weight outside {WEIGHT[0]:g}..{WEIGHT[1]:g} kg'
+HEIGHT_OUTSIDE: str = f'height outside {HEIGHT[0]:g}..{HEIGHT[1]:g} cm'
+UNKNOWN_BLOOD: str = 'unknown blood'
+BMI_OUTLIER: str = 'BMI outlier'
+
+STAGE_SQL: str = """
+    CREATE TEMPORARY TABLE IF NOT EXISTS vitals_stage
+    (
+        line integer PRIMARY KEY,
+        patient integer NOT NULL,
+        weight float4,
+        height float4,
+        blood smallint
+    ) ON COMMIT DELETE ROWS"""
+
+UNKNOWN_BLOOD_SQL: str = """
+    DELETE FROM vitals_stage s
+    WHERE blood IS NOT NULL AND NOT EXISTS (SELECT 1 FROM blood b WHERE b.blood_id = s.blood)
+    RETURNING line"""
+
+# A partial reading is judged by the BMI it gives together with the stored weight or height
+PARTIAL_BMI_SQL: str = """
+    DELETE FROM vitals_stage s
+    USING health_card h
+    WHERE h.patient = s.patient AND (s.weight IS NULL OR s.height IS NULL)
+        AND COALESCE(s.weight, h.weight) * 10000 / (COALESCE(s.height, h.height) * COALESCE(s.height, h.height))
+            NOT BETWEEN %s AND %s
+    RETURNING s.line"""
+
+# One set-based merge for the whole batch; calculate_bmi recomputes bmi on every changed row
+MERGE_SQL: str = """
+    UPDATE health_card h
+    SET
+        weight = COALESCE(s.weight, h.weight),
+        height = COALESCE(s.height, h.height),
+        blood = COALESCE(s.blood, h.blood)
+    FROM vitals_stage s
+    WHERE h.patient = s.patient
+    RETURNING s.line"""
+
+
+def check(weight: float | None, height: float | None, blood: int | None) -> str | None:
+    # Scalar version of validate() for a single record; the BMI needs both values, so callers pass partial
+    # readings merged with the stored ones
+    if weight is not None and not WEIGHT[0] <= weight <= WEIGHT[1]:
+        return WEIGHT_OUTSIDE
+    if height is not None and not HEIGHT[0] <= height <= HEIGHT[1]:
+        return HEIGHT_OUTSIDE
+    if blood is not None and not BLOOD[0] <= blood <= BLOOD[1]:
+        return UNKNOWN_BLOOD
+    if weight is not None and height is not None and not BMI[0] <= weight * 10000 / (height * height) <= BMI[1]:
+        return BMI_OUTLIER
+    return None
+
+
+def parse(lines) -> tuple[list, list]:
+    # patient, weight, height, blood per line; empty fields keep the stored value
+    rows, rejected = [], []
+
+    for line, row in enumerate(csv.reader(lines), 1):
+        if not row or row[0].startswith('#'):
+            continue
+
+        try:
+            patient, *values = (field.strip() for field in row)
+            values = (values + [''] * 3)[:3]
+            rows.append((line, int(patient), *(float(v) if v else float('nan') for v in values)))
+        except ValueError as e:
+            rejected.append((line, f'malformed: {e}'))
+
+    return rows, rejected
+
+
+def validate(rows: list) -> tuple[list, list]:
+    # Vectorized range and BMI checks over the whole batch; NaN means "not given" and always passes.
+    # When a patient appears more than once, the last reading wins. Partial readings get their BMI
+    # checked in ingest(), against the stored values.
+    if np is None:
+        # A ValueError is reported to the user like any rejected input, instead of ending the session
+        raise ValueError('Bulk vitals validation requires numpy')
+    if not rows:
+        return [], []
+
+    data = np.array(rows, dtype=float)
+    line, patient, weight, height, blood = data.T
+
+    def outside(values, bounds):
+        return ~np.isnan(values) & ((values < bounds[0]) | (values > bounds[1]))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        bmi = weight * 10000 / (height * height)
+
+    checks = (
+        (patient < 1, UNKNOWN_PATIENT),
+        (outside(weight, WEIGHT), WEIGHT_OUTSIDE),
+        (outside(height, HEIGHT), HEIGHT_OUTSIDE),
+        (outside(blood, BLOOD) | (~np.isnan(blood) & (blood != np.round(blood))), UNKNOWN_BLOOD),
+        (outside(bmi, BMI), BMI_OUTLIER),
+    )
+
+    reasons = np.full(len(rows), '', dtype=object)
+    for failed, reason in reversed(checks):
+        reasons[failed] = reason
+
+    ok = reasons == ''
+    _, last = np.unique(patient[ok][::-1], return_index=True)
+    keep = np.flatnonzero(ok)[::-1][last]
+    superseded = np.setdiff1d(np.flatnonzero(ok), keep)
+    reasons[superseded] = 'superseded by a later reading'
+
+    valid = [
+        (int(line[i]), int(patient[i]), *(None if np.isnan(v) else float(v) for v in (weight[i], height[i])),
+         None if np.isnan(blood[i]) else int(blood[i]))
+        for i in np.sort(keep)
+    ]
+    rejected = [(int(line[i]), reasons[i]) for i in np.flatnonzero(reasons != '')]
+    return valid, rejected
+
+
+def ingest(connection, lines) -> Ingest:
+    # Everything runs in the caller's transaction: one COPY into staging, two checks and one merge
+    rows, malformed = parse(lines)
+    valid, rejected = validate(rows)
+
+    with connection.cursor() as cursor:
+        cursor.execute(STAGE_SQL)
+        cursor.execute("TRUNCATE vitals_stage")
+        cursor.copy_expert("COPY vitals_stage (line, patient, weight, height, blood) FROM STDIN", RowStream(valid), 1 << 16)
+
+        cursor.execute(UNKNOWN_BLOOD_SQL)
+        unknown_blood = {line for (line,) in cursor.fetchall()}
+
+        cursor.execute(PARTIAL_BMI_SQL, BMI)
+        outliers = {line for (line,) in cursor.fetchall()}
+
+        cursor.execute(MERGE_SQL)
+        applied = {line for (line,) in cursor.fetchall()}
+
+    rejected += [(line, UNKNOWN_BLOOD) for line in unknown_blood]
+    rejected += [(line, BMI_OUTLIER) for line in outliers]
+    rejected += [(row[0], UNKNOWN_PATIENT) for row in valid if row[0] not in applied | unknown_blood | outliers]
+
+    return Ingest(len(rows) + len(malformed), len(applied), sorted(malformed + rejected))
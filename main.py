@@ -1,26 +1,77 @@
-from dotenv import load_dotenv, dotenv_values
+import argparse
+import logging
+import sys
+
 import psycopg2
+from dotenv import load_dotenv, dotenv_values
+from psycopg2.pool import ThreadedConnectionPool
 import bloodbank
+import bloodbank.cache
+import bloodbank.replicas
+import bloodbank.server
 import bloodbank.user
 
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--serve', action='store_true', help='serve many sessions over TCP')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5050)
+    parser.add_argument('--batch', metavar='FILE', help="run a command script or JSON lines ('-' for stdin) and exit")
+    parser.add_argument('--format', choices=('text', 'json'), default='text', help='output format of --batch')
+    args = parser.parse_args()
+
     config: dict = dotenv_values('.env')
+    database: dict = {'dbname': config.get('DB_NAME'), 'user': config.get('USER'), 'password': config.get('PASSWORD')}
 
-    connection = psycopg2.connect(
-        dbname=config.get('DB_NAME'),
-        user=config.get('USER'),
-        password=config.get('PASSWORD')
+    pool = ThreadedConnectionPool(
+        1, int(config.get('POOL_SIZE', 8)) if args.serve else 1,
+        **database,
+        connection_factory=bloodbank.Connection,
+        # Backstop for a session that is still left idle in transaction by a bug: the server ends it
+        options=f"-c idle_in_transaction_session_timeout={int(config.get('IDLE_IN_TRANSACTION_MS', 30000))}"
     )
 
-    terminal = bloodbank.Terminal(connection)
+    logging.getLogger('bloodbank.slow').addHandler(logging.FileHandler(config.get('SLOW_QUERY_LOG', 'slow_queries.log')))
+    cache = bloodbank.cache.Cache(ttl=float(config.get('CACHE_TTL', 300)))
+    bloodbank.cache.Listener(cache, **database).start()
+    replicas = [
+        bloodbank.replicas.Replica(dsn.strip(), pool.maxconn)
+        for dsn in config.get('REPLICA_DSNS', '').split(';') if dsn.strip()
+    ]
+    terminal = bloodbank.Terminal(
+        pool, slow_query_ms=float(config.get('SLOW_QUERY_MS', 200)), cache=cache, replicas=replicas
+    )
+    if replicas:
+        bloodbank.replicas.HealthCheck(terminal, max_lag=int(config.get('REPLICA_MAX_LAG_BYTES', 16 << 20))).start()
+
+    if args.serve:
+        files = config.get('FILES_DIR', 'files')
+        with bloodbank.server.Server((args.host, args.port), terminal, files=files) as server:
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+        pool.closeall()
+        return
+
+    if args.batch:
+        with (sys.stdin if args.batch == '-' else open(args.batch)) as script:
+            bloodbank.user.User(terminal, script, interactive=False, output=args.format).batch()
+        pool.closeall()
+        return
+
     user = bloodbank.user.User(terminal)
 
     while True:
         try:
             user.interact()
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, EOFError):
             break
+        except (LookupError, ValueError, TypeError, OSError, psycopg2.Error) as e:
+            print(f"\t{e}")
+
+    pool.closeall()
 
 
 if __name__ == '__main__':
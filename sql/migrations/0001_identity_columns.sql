@@ -0,0 +1,32 @@
+------------------------- IDENTITY COLUMNS FOR PATIENT, APPOINTMENT, ANNOUNCEMENT -------------------------
+-- Converts existing tables in place and moves every sequence past the current maximum id.
+-- Safe to re-run, e.g. after loading sql/fillers with explicit ids (python -m bloodbank.migrate --reapply 1).
+DO
+    $$
+    DECLARE
+        target record;
+    BEGIN
+        FOR target IN
+            SELECT * FROM (VALUES
+                ('patient', 'patient_id'),
+                ('appointment', 'appointment_id'),
+                ('announcement', 'announcement_id')
+            ) AS t(tbl, col)
+        LOOP
+            IF NOT EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = current_schema()
+                    AND table_name = target.tbl
+                    AND column_name = target.col
+                    AND is_identity = 'YES'
+            ) THEN
+                EXECUTE format('ALTER TABLE %I ALTER COLUMN %I ADD GENERATED BY DEFAULT AS IDENTITY', target.tbl, target.col);
+            END IF;
+
+            EXECUTE format(
+                'SELECT setval(pg_get_serial_sequence(%L, %L), COALESCE(MAX(%I), 0) + 1, false) FROM %I',
+                target.tbl, target.col, target.col, target.tbl
+            );
+        END LOOP;
+    END
+    $$;
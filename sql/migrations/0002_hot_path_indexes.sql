@@ -0,0 +1,17 @@
+------------------------------- APPOINTMENTS BY DOCTOR / PATIENT -------------------------------
+-- Match the keyset pages in doctor_appointments / patient_appointments: equality, then (time, appointment_id)
+CREATE INDEX IF NOT EXISTS appointment_doctor_time_idx ON appointment (doctor, time, appointment_id);
+CREATE INDEX IF NOT EXISTS appointment_patient_time_idx ON appointment (patient, time, appointment_id);
+
+-- Recent appointments and per-day counts in sql/queries.sql
+CREATE INDEX IF NOT EXISTS appointment_time_idx ON appointment (time);
+
+------------------------------------ ANNOUNCEMENTS BY AUTHOR -----------------------------------
+CREATE INDEX IF NOT EXISTS announcement_author_idx ON announcement (author, announcement_id);
+
+------------------------------------ BILLS BY ISSUER / RECEIVER --------------------------------
+CREATE INDEX IF NOT EXISTS bill_issuer_idx ON bill (issuer);
+CREATE INDEX IF NOT EXISTS bill_receiver_idx ON bill (receiver);
+
+------------------------------------------ ACTION LOG ------------------------------------------
+CREATE INDEX IF NOT EXISTS action_time_idx ON action (time);
@@ -0,0 +1,119 @@
+----------------------------- STATEMENT-LEVEL AUDIT AND BILL TRIGGERS -----------------------------
+-- Replaces the FOR EACH ROW triggers with one set-based INSERT per statement over its transition table,
+-- and computes BMI on the written row. Mirrors sql/triggers.sql.
+DROP TRIGGER IF EXISTS log_new_bill ON bill;
+DROP TRIGGER IF EXISTS log_new_appointment ON appointment;
+DROP TRIGGER IF EXISTS log_new_announcement ON announcement;
+DROP TRIGGER IF EXISTS create_health_card_for_new_patient ON patient;
+DROP TRIGGER IF EXISTS add_bill_to_new_appointment ON appointment;
+
+--------------------------------------- LOG NEW BILLS ---------------------------------------
+CREATE OR REPLACE FUNCTION log_new_bill()
+RETURNS TRIGGER AS
+    $$
+    BEGIN
+        INSERT INTO action (type, patient_subject, patient_object, staff_subject, staff_object, time)
+        SELECT 'bill', NULL, receiver, issuer, NULL, NOW() FROM new_rows;
+        RETURN NULL;
+    END
+    $$
+LANGUAGE 'plpgsql';
+
+CREATE OR REPLACE TRIGGER log_new_bill
+    AFTER INSERT ON bill
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION log_new_bill();
+
+------------------------------------ LOG NEW APPOINTMENTS -----------------------------------
+CREATE OR REPLACE FUNCTION log_new_appointment()
+RETURNS TRIGGER AS
+    $$
+    BEGIN
+        INSERT INTO action (type, patient_subject, patient_object, staff_subject, staff_object, time)
+        SELECT 'appointment', NULL, patient, doctor, NULL, NOW() FROM new_rows;
+        RETURN NULL;
+    END
+    $$
+LANGUAGE 'plpgsql';
+
+CREATE OR REPLACE TRIGGER log_new_appointment
+    AFTER INSERT ON appointment
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION log_new_appointment();
+
+----------------------------------- LOG NEW ANNOUNCEMENTS -----------------------------------
+CREATE OR REPLACE FUNCTION log_new_announcement()
+RETURNS TRIGGER AS
+    $$
+    BEGIN
+        INSERT INTO action (type, patient_subject, patient_object, staff_subject, staff_object, time)
+        SELECT 'announcement', NULL, NULL, author, NULL, NOW() FROM new_rows;
+        RETURN NULL;
+    END
+    $$
+LANGUAGE 'plpgsql';
+
+CREATE OR REPLACE TRIGGER log_new_announcement
+    AFTER INSERT ON announcement
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION log_new_announcement();
+
+--------------------------------- CALCULATE PATIENT'S BMI -----------------------------------
+-- Computed on the row being written instead of a second UPDATE after it
+DROP TRIGGER IF EXISTS recalculate_bmi_on_update ON health_card;
+DROP TRIGGER IF EXISTS calculate_bmi_on_insert ON health_card;
+
+CREATE OR REPLACE FUNCTION recalculate_bmi()
+RETURNS TRIGGER AS
+    $$
+        BEGIN
+            NEW.bmi := NEW.weight * 10000 / NULLIF(NEW.height * NEW.height, 0);
+            RETURN NEW;
+        END;
+    $$
+LANGUAGE 'plpgsql';
+
+CREATE OR REPLACE TRIGGER calculate_bmi
+    BEFORE INSERT OR UPDATE OF weight, height
+    ON health_card
+    FOR EACH ROW
+    EXECUTE FUNCTION recalculate_bmi();
+
+------------------------ CREATE NEW HEALTH RECORDS FOR NEW PATIENTS -------------------------
+CREATE OR REPLACE FUNCTION assign_new_record()
+RETURNS trigger AS
+    $$
+        BEGIN
+            INSERT INTO health_card (patient, description, full_name)
+            SELECT patient_id, 'Blank health card', CONCAT(first_name, ' ', last_name) FROM new_rows;
+            RETURN NULL;
+        END
+    $$
+LANGUAGE 'plpgsql';
+
+CREATE OR REPLACE TRIGGER create_health_card_for_new_patient
+    AFTER INSERT ON patient
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION assign_new_record();
+
+-------------------------- CREATE EMPTY BILLS FOR NEW APPOINTMENTS --------------------------
+CREATE OR REPLACE FUNCTION add_bill()
+RETURNS trigger AS
+    $$
+        BEGIN
+            INSERT INTO bill (issuer, receiver, amount)
+            SELECT doctor, patient, 0 FROM new_rows ORDER BY appointment_id;
+            RETURN NULL;
+        END
+    $$
+LANGUAGE 'plpgsql';
+
+CREATE OR REPLACE TRIGGER add_bill_to_new_appointment
+    AFTER INSERT ON appointment
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION add_bill();
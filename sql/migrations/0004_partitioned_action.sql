@@ -0,0 +1,131 @@
+------------------------------ MONTHLY PARTITIONS OF THE ACTION LOG ------------------------------
+CREATE SCHEMA IF NOT EXISTS action_archive;
+
+-- Creates the partitions for from_month .. from_month + months_ahead. Rows that already landed in
+-- action_default for a new month are moved into its partition before it is attached.
+CREATE OR REPLACE FUNCTION create_action_partitions(
+    months_ahead integer DEFAULT 3,
+    from_month date DEFAULT date_trunc('month', NOW())::date
+)
+RETURNS integer AS
+    $$
+    DECLARE
+        month_start date;
+        month_end date;
+        partition text;
+        created integer := 0;
+    BEGIN
+        FOR i IN 0..months_ahead LOOP
+            month_start := (date_trunc('month', from_month) + make_interval(months => i))::date;
+            month_end := (month_start + interval '1 month')::date;
+            partition := format('action_%s', to_char(month_start, 'YYYY_MM'));
+
+            CONTINUE WHEN to_regclass(partition) IS NOT NULL
+                OR to_regclass(format('action_archive.%I', partition)) IS NOT NULL;
+
+            EXECUTE format('CREATE TABLE %I (LIKE action INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', partition);
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM action_default WHERE time >= $1 AND time < $2 RETURNING *) '
+                'INSERT INTO %I SELECT * FROM moved', partition
+            ) USING month_start, month_end;
+            EXECUTE format(
+                'ALTER TABLE action ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', partition, month_start, month_end
+            );
+            created := created + 1;
+        END LOOP;
+
+        RETURN created;
+    END
+    $$
+LANGUAGE 'plpgsql';
+
+-- Detaches every monthly partition that ended before NOW() - retention and moves it to the
+-- action_archive schema as a whole table, from where it can be dumped or dropped
+CREATE OR REPLACE FUNCTION archive_action_partitions(retention interval DEFAULT interval '1 year')
+RETURNS SETOF text AS
+    $$
+    DECLARE
+        partition text;
+    BEGIN
+        FOR partition IN
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'action'::regclass
+                AND c.relname ~ '^action_\d{4}_\d{2}$'
+                AND to_date(substring(c.relname FROM 8), 'YYYY_MM') + interval '1 month' <= NOW() - retention
+            ORDER BY c.relname
+        LOOP
+            EXECUTE format('ALTER TABLE action DETACH PARTITION %I', partition);
+            EXECUTE format('ALTER TABLE %I SET SCHEMA action_archive', partition);
+            RETURN NEXT partition;
+        END LOOP;
+    END
+    $$
+LANGUAGE 'plpgsql';
+
+DO
+    $$
+    DECLARE
+        first_month date;
+    BEGIN
+        IF (SELECT relkind FROM pg_class WHERE oid = 'action'::regclass) = 'p' THEN
+            RETURN;
+        END IF;
+
+        ALTER TABLE action RENAME TO action_unpartitioned;
+        ALTER INDEX action_pkey RENAME TO action_unpartitioned_pkey;
+        ALTER INDEX IF EXISTS action_time_idx RENAME TO action_unpartitioned_time_idx;
+
+        CREATE TABLE action
+        (
+            action_id bigint NOT NULL DEFAULT nextval('action_action_id_seq'),
+            type varchar(32) NOT NULL,
+            patient_subject integer,
+            patient_object integer,
+            staff_subject integer,
+            staff_object integer,
+            time timestamp NOT NULL,
+
+            CONSTRAINT action_pkey PRIMARY KEY (action_id, time),
+            CONSTRAINT fk_action_type FOREIGN KEY (type) REFERENCES action_type(name) ON DELETE SET NULL,
+            CONSTRAINT fk_patient_subject FOREIGN KEY (patient_subject) REFERENCES patient(patient_id) ON DELETE SET NULL,
+            CONSTRAINT fk_patient_object FOREIGN KEY (patient_object) REFERENCES patient(patient_id) ON DELETE SET NULL,
+            CONSTRAINT fk_doctor_subject FOREIGN KEY (staff_subject) REFERENCES staff(staff_id) ON DELETE SET NULL,
+            CONSTRAINT fk_doctor_object FOREIGN KEY (staff_object) REFERENCES staff(staff_id) ON DELETE SET NULL,
+
+            CONSTRAINT le_one_patient CHECK (
+                CASE WHEN patient_subject is NULL THEN 0 ELSE 1 END +
+                CASE WHEN patient_object is NULL THEN 0 ELSE 1 END <= 1
+            ),
+            CONSTRAINT le_one_doctor CHECK (
+                CASE WHEN staff_subject is NULL THEN 0 ELSE 1 END +
+                CASE WHEN staff_object is NULL THEN 0 ELSE 1 END <= 1
+            ),
+            CONSTRAINT le_one_subject CHECK (
+                CASE WHEN patient_subject is NULL THEN 0 ELSE 1 END +
+                CASE WHEN staff_subject is NULL THEN 0 ELSE 1 END <= 1
+            ),
+            CONSTRAINT le_one_object CHECK (
+                CASE WHEN patient_object is NULL THEN 0 ELSE 1 END +
+                CASE WHEN staff_object is NULL THEN 0 ELSE 1 END <= 1
+            )
+        ) PARTITION BY RANGE (time);
+
+        CREATE INDEX action_time_idx ON action (time, action_id);
+        CREATE TABLE action_default PARTITION OF action DEFAULT;
+        ALTER SEQUENCE action_action_id_seq OWNED BY action.action_id;
+
+        SELECT date_trunc('month', COALESCE(MIN(time), NOW()))::date INTO first_month FROM action_unpartitioned;
+        PERFORM create_action_partitions(
+            (EXTRACT(YEAR FROM age(date_trunc('month', NOW()), first_month)) * 12 +
+             EXTRACT(MONTH FROM age(date_trunc('month', NOW()), first_month)))::integer + 3,
+            first_month
+        );
+
+        INSERT INTO action SELECT * FROM action_unpartitioned;
+        DROP TABLE action_unpartitioned;
+    END
+    $$;
+
+SELECT create_action_partitions();
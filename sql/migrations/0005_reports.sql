@@ -0,0 +1,120 @@
+------------------------------------ PRECOMPUTED REPORTS ------------------------------------
+-- Materialized versions of the analytics in sql/queries.sql. Each has a unique index so it can be
+-- refreshed CONCURRENTLY while dashboards keep reading it.
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS report_avg_bill_by_issuer AS
+SELECT issuer, ROUND(CAST(AVG(amount) as DEC(12, 2)), 2) AS avg_amount, COUNT(*) AS bills
+FROM bill
+WHERE issuer IS NOT NULL
+GROUP BY issuer;
+
+CREATE UNIQUE INDEX IF NOT EXISTS report_avg_bill_by_issuer_idx ON report_avg_bill_by_issuer (issuer);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS report_appointments_per_day AS
+SELECT time::date AS day, COUNT(*) AS appointments_number
+FROM appointment
+GROUP BY time::date;
+
+CREATE UNIQUE INDEX IF NOT EXISTS report_appointments_per_day_idx ON report_appointments_per_day (day);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS report_room_stats AS
+SELECT
+    a.room,
+    ROUND(CAST(AVG(h.weight) AS DEC(12, 2)), 2) AS avg_weight,
+    ROUND(CAST(AVG(h.height) AS DEC(12, 2)), 2) AS avg_height,
+    COUNT(h.patient) AS num_patients
+FROM health_card h
+JOIN appointment a ON a.patient = h.patient
+GROUP BY a.room;
+
+CREATE UNIQUE INDEX IF NOT EXISTS report_room_stats_idx ON report_room_stats (room);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS report_doctor_totals AS
+SELECT issuer, SUM(amount) AS total_amount, COUNT(*) AS bills
+FROM bill
+WHERE issuer IS NOT NULL
+GROUP BY issuer;
+
+CREATE UNIQUE INDEX IF NOT EXISTS report_doctor_totals_idx ON report_doctor_totals (issuer);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS report_healthy_patients AS
+SELECT
+    p.patient_id, CONCAT(p.first_name, ' ', p.last_name) AS full_name,
+    h.birth_date, h.height, h.weight,
+    ROUND(CAST(h.weight * 10000 / (h.height * h.height) AS DEC(12, 2)), 2) AS bmi,
+    b.type
+FROM patient p
+INNER JOIN health_card h ON p.patient_id = h.patient
+INNER JOIN blood b on b.blood_id = h.blood
+WHERE
+    ROUND(h.weight * 10000 / (h.height * h.height)) > 17 AND
+    ROUND(h.weight * 10000 / (h.height * h.height)) < 30 AND
+    b.contaminated IS FALSE;
+
+CREATE UNIQUE INDEX IF NOT EXISTS report_healthy_patients_idx ON report_healthy_patients (patient_id);
+
+--------------------------------------- DIRTY TRACKING --------------------------------------
+-- Writers only flip a flag; refresh_reports() rebuilds just the reports whose sources changed
+CREATE TABLE IF NOT EXISTS report_refresh
+(
+    name text PRIMARY KEY,
+    dirty boolean NOT NULL DEFAULT false,
+    refreshed_at timestamp NOT NULL DEFAULT NOW()
+);
+
+INSERT INTO report_refresh (name) VALUES
+    ('report_avg_bill_by_issuer'),
+    ('report_appointments_per_day'),
+    ('report_room_stats'),
+    ('report_doctor_totals'),
+    ('report_healthy_patients')
+ON CONFLICT (name) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION mark_reports_dirty()
+RETURNS TRIGGER AS
+    $$
+    BEGIN
+        UPDATE report_refresh SET dirty = true
+        WHERE name = ANY(TG_ARGV) AND NOT dirty;
+        RETURN NULL;
+    END
+    $$
+LANGUAGE 'plpgsql';
+
+CREATE OR REPLACE TRIGGER bill_marks_reports_dirty
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON bill
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION mark_reports_dirty('report_avg_bill_by_issuer', 'report_doctor_totals');
+
+CREATE OR REPLACE TRIGGER appointment_marks_reports_dirty
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON appointment
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION mark_reports_dirty('report_appointments_per_day', 'report_room_stats');
+
+CREATE OR REPLACE TRIGGER health_card_marks_reports_dirty
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON health_card
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION mark_reports_dirty('report_room_stats', 'report_healthy_patients');
+
+CREATE OR REPLACE TRIGGER patient_marks_reports_dirty
+    AFTER UPDATE OF first_name, last_name OR DELETE OR TRUNCATE ON patient
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION mark_reports_dirty('report_healthy_patients');
+
+CREATE OR REPLACE FUNCTION refresh_reports(force boolean DEFAULT false)
+RETURNS SETOF text AS
+    $$
+    DECLARE
+        report text;
+    BEGIN
+        FOR report IN
+            UPDATE report_refresh SET dirty = false, refreshed_at = NOW()
+            WHERE dirty OR force
+            RETURNING name
+        LOOP
+            EXECUTE format('REFRESH MATERIALIZED VIEW CONCURRENTLY %I', report);
+            RETURN NEXT report;
+        END LOOP;
+    END
+    $$
+LANGUAGE 'plpgsql';
@@ -0,0 +1,27 @@
+---------------------------------- NO DOUBLE-BOOKED DOCTORS OR ROOMS ----------------------------------
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+ALTER TABLE appointment ADD COLUMN IF NOT EXISTS duration interval NOT NULL DEFAULT interval '30 minutes';
+
+-- Legacy rows that overlap an earlier booking of the same doctor or room keep their data but get an empty
+-- range, which overlaps nothing. Every row still has the 30 minute default here, so overlap means the start
+-- times are less than 30 minutes apart, which the (doctor, time) and (time) indexes can answer.
+UPDATE appointment a
+SET duration = interval '0'
+WHERE duration > interval '0' AND (
+    EXISTS (
+        SELECT 1 FROM appointment b
+        WHERE b.doctor = a.doctor AND b.appointment_id < a.appointment_id
+            AND b.time > a.time - a.duration AND b.time < a.time + a.duration
+    ) OR EXISTS (
+        SELECT 1 FROM appointment b
+        WHERE b.room = a.room AND b.appointment_id < a.appointment_id
+            AND b.time > a.time - a.duration AND b.time < a.time + a.duration
+    )
+);
+
+ALTER TABLE appointment
+    DROP CONSTRAINT IF EXISTS no_doctor_overlap,
+    DROP CONSTRAINT IF EXISTS no_room_overlap,
+    ADD CONSTRAINT no_doctor_overlap EXCLUDE USING gist (doctor WITH =, tsrange(time, time + duration) WITH &&),
+    ADD CONSTRAINT no_room_overlap EXCLUDE USING gist (room WITH =, tsrange(time, time + duration) WITH &&);
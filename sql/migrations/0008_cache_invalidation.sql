@@ -0,0 +1,43 @@
+--------------------------------- CACHE INVALIDATION NOTIFICATIONS ---------------------------------
+-- bloodbank.cache.Listener drops everything cached from a table when its name arrives on this channel.
+-- Notifications are sent on commit and collapsed to one per table and transaction.
+CREATE OR REPLACE FUNCTION notify_cache()
+RETURNS TRIGGER AS
+    $$
+    BEGIN
+        PERFORM pg_notify('bloodbank_cache', TG_TABLE_NAME);
+        RETURN NULL;
+    END
+    $$
+LANGUAGE 'plpgsql';
+
+CREATE OR REPLACE TRIGGER appointment_type_notify_cache
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON appointment_type
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_cache();
+
+CREATE OR REPLACE TRIGGER room_notify_cache
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON room
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_cache();
+
+CREATE OR REPLACE TRIGGER blood_type_notify_cache
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON blood_type
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_cache();
+
+CREATE OR REPLACE TRIGGER staff_status_notify_cache
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON staff_status
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_cache();
+
+-- Display names are cached per id and only for rows that exist, so inserts need no notification
+CREATE OR REPLACE TRIGGER staff_notify_cache
+    AFTER UPDATE OF first_name, last_name OR DELETE OR TRUNCATE ON staff
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_cache();
+
+CREATE OR REPLACE TRIGGER patient_notify_cache
+    AFTER UPDATE OF first_name, last_name OR DELETE OR TRUNCATE ON patient
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_cache();
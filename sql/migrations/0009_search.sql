@@ -0,0 +1,33 @@
+------------------------------------------ FULL-TEXT SEARCH ------------------------------------------
+-- Announcements and health cards carry a tsvector kept current by the built-in tsvector_update_trigger
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE announcement ADD COLUMN IF NOT EXISTS search tsvector;
+ALTER TABLE health_card ADD COLUMN IF NOT EXISTS search tsvector;
+
+CREATE OR REPLACE TRIGGER announcement_search
+    BEFORE INSERT OR UPDATE OF title, description ON announcement
+    FOR EACH ROW
+    EXECUTE FUNCTION tsvector_update_trigger(search, 'pg_catalog.english', title, description);
+
+CREATE OR REPLACE TRIGGER health_card_search
+    BEFORE INSERT OR UPDATE OF description ON health_card
+    FOR EACH ROW
+    EXECUTE FUNCTION tsvector_update_trigger(search, 'pg_catalog.english', description);
+
+UPDATE announcement
+SET search = to_tsvector('pg_catalog.english', COALESCE(title, '') || ' ' || COALESCE(description, ''))
+WHERE search IS NULL;
+
+UPDATE health_card
+SET search = to_tsvector('pg_catalog.english', COALESCE(description, ''))
+WHERE search IS NULL;
+
+CREATE INDEX IF NOT EXISTS announcement_search_idx ON announcement USING gin (search);
+CREATE INDEX IF NOT EXISTS health_card_search_idx ON health_card USING gin (search);
+
+------------------------------------- FUZZY SEARCH OF PATIENTS --------------------------------------
+-- Trigram indexes answer ILIKE '%part%' on the full name, email and phone without a sequential scan
+CREATE INDEX IF NOT EXISTS patient_name_trgm_idx ON patient USING gin ((first_name || ' ' || last_name) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS patient_email_trgm_idx ON patient USING gin (email gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS patient_phone_trgm_idx ON patient USING gin (phone gin_trgm_ops);
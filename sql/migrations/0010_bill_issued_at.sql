@@ -0,0 +1,5 @@
+---------------------------------------- BILL ISSUE TIME ----------------------------------------
+-- Lets bills be exported by date range. Bills that existed before this migration get its time.
+ALTER TABLE bill ADD COLUMN IF NOT EXISTS issued_at timestamp NOT NULL DEFAULT NOW();
+
+CREATE INDEX IF NOT EXISTS bill_issued_at_idx ON bill (issued_at, bill_id);
@@ -0,0 +1,62 @@
+------------------------------------------ SLOT LENGTH PER TYPE ------------------------------------------
+-- Availability searches step through the day in slots of the requested type's length,
+-- and new appointments of that type take that long
+ALTER TABLE appointment_type ADD COLUMN IF NOT EXISTS duration interval NOT NULL DEFAULT interval '30 minutes';
+
+--------------------------------------- AVAILABILITY INVALIDATION ---------------------------------------
+-- Cached free slots are kept per day; every day an appointment starts or ends on is announced on the
+-- cache channel as 'availability:YYYY-MM-DD', and a TRUNCATE drops them all
+CREATE OR REPLACE FUNCTION notify_availability()
+RETURNS TRIGGER AS
+    $$
+    DECLARE
+        changed date;
+    BEGIN
+        IF TG_OP = 'TRUNCATE' THEN
+            PERFORM pg_notify('bloodbank_cache', 'availability');
+            RETURN NULL;
+        END IF;
+
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            FOR changed IN
+                SELECT DISTINCT d FROM new_rows, LATERAL (VALUES (time::date), ((time + duration)::date)) AS v(d)
+            LOOP
+                PERFORM pg_notify('bloodbank_cache', 'availability:' || changed);
+            END LOOP;
+        END IF;
+
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            FOR changed IN
+                SELECT DISTINCT d FROM old_rows, LATERAL (VALUES (time::date), ((time + duration)::date)) AS v(d)
+            LOOP
+                PERFORM pg_notify('bloodbank_cache', 'availability:' || changed);
+            END LOOP;
+        END IF;
+
+        RETURN NULL;
+    END
+    $$
+LANGUAGE 'plpgsql';
+
+CREATE OR REPLACE TRIGGER appointment_insert_notify_availability
+    AFTER INSERT ON appointment
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_availability();
+
+CREATE OR REPLACE TRIGGER appointment_update_notify_availability
+    AFTER UPDATE ON appointment
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_availability();
+
+CREATE OR REPLACE TRIGGER appointment_delete_notify_availability
+    AFTER DELETE ON appointment
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_availability();
+
+CREATE OR REPLACE TRIGGER appointment_truncate_notify_availability
+    AFTER TRUNCATE ON appointment
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_availability();
@@ -0,0 +1,27 @@
+------------------------------------ REPORTS AS IN QUERIES.SQL ------------------------------------
+-- 0005 built report_room_stats with an INNER JOIN and without the height filter, and dropped the NULL issuer
+-- group from report_avg_bill_by_issuer, so both returned other rows than their reports in sql/queries.sql.
+-- Patients without appointments are counted again under a NULL room, and bills without an issuer under a NULL issuer.
+DROP MATERIALIZED VIEW IF EXISTS report_avg_bill_by_issuer;
+
+CREATE MATERIALIZED VIEW report_avg_bill_by_issuer AS
+SELECT issuer, ROUND(CAST(AVG(amount) as DEC(12, 2)), 2) AS avg_amount, COUNT(*) AS bills
+FROM bill
+GROUP BY issuer;
+
+CREATE UNIQUE INDEX report_avg_bill_by_issuer_idx ON report_avg_bill_by_issuer (issuer);
+
+DROP MATERIALIZED VIEW IF EXISTS report_room_stats;
+
+CREATE MATERIALIZED VIEW report_room_stats AS
+SELECT
+    a.room,
+    ROUND(CAST(AVG(h.weight) AS DEC(12, 2)), 2) AS avg_weight,
+    ROUND(CAST(AVG(h.height) AS DEC(12, 2)), 2) AS avg_height,
+    COUNT(h.patient) AS num_patients
+FROM health_card h
+LEFT JOIN appointment a ON a.patient = h.patient
+GROUP BY a.room
+HAVING AVG(h.height) < 185;
+
+CREATE UNIQUE INDEX report_room_stats_idx ON report_room_stats (room);
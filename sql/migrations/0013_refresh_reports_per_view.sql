@@ -0,0 +1,6 @@
+---------------------------------- REFRESH OUTSIDE THE FLAG'S TRANSACTION ----------------------------------
+-- refresh_reports() cleared the dirty flags in the transaction that ran the refreshes. A write committed meanwhile
+-- saw dirty = true and left it, and the refresh then committed dirty = false without that write. With force, writers
+-- waited on the flag's row lock for the whole refresh. bloodbank.reports.refresh() now commits each cleared flag
+-- before rebuilding its view, so the function is dropped.
+DROP FUNCTION IF EXISTS refresh_reports(boolean);
@@ -0,0 +1,12 @@
+------------------------------------ SESSION INVALIDATION ------------------------------------
+-- Sessions resolve their status, name and credentials once at login and again whenever 'staff' or 'patient'
+-- arrives on the cache channel, so changes to those columns notify as well as name changes
+CREATE OR REPLACE TRIGGER staff_notify_cache
+    AFTER UPDATE OF first_name, last_name, status, email, password OR DELETE OR TRUNCATE ON staff
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_cache();
+
+CREATE OR REPLACE TRIGGER patient_notify_cache
+    AFTER UPDATE OF first_name, last_name, email, password OR DELETE OR TRUNCATE ON patient
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_cache();
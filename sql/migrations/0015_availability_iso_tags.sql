@@ -0,0 +1,34 @@
+------------------------------------ DATESTYLE-PROOF AVAILABILITY TAGS ------------------------------------
+-- 0011 turned the day into text with the session's DateStyle; under e.g. 'SQL, DMY' the tags never matched the
+-- ISO dates of the cache keys, so cached free slots outlived new bookings
+CREATE OR REPLACE FUNCTION notify_availability()
+RETURNS TRIGGER AS
+    $$
+    DECLARE
+        changed date;
+    BEGIN
+        IF TG_OP = 'TRUNCATE' THEN
+            PERFORM pg_notify('bloodbank_cache', 'availability');
+            RETURN NULL;
+        END IF;
+
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            FOR changed IN
+                SELECT DISTINCT d FROM new_rows, LATERAL (VALUES (time::date), ((time + duration)::date)) AS v(d)
+            LOOP
+                PERFORM pg_notify('bloodbank_cache', 'availability:' || to_char(changed, 'YYYY-MM-DD'));
+            END LOOP;
+        END IF;
+
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            FOR changed IN
+                SELECT DISTINCT d FROM old_rows, LATERAL (VALUES (time::date), ((time + duration)::date)) AS v(d)
+            LOOP
+                PERFORM pg_notify('bloodbank_cache', 'availability:' || to_char(changed, 'YYYY-MM-DD'));
+            END LOOP;
+        END IF;
+
+        RETURN NULL;
+    END
+    $$
+LANGUAGE 'plpgsql';
@@ -17,7 +17,6 @@ AS
                 height = COALESCE(new_height, height),
                 birth_date = COALESCE(new_birth_date, birth_date)
             WHERE patient = patient_id;
-            COMMIT;
         END;
     $$
 LANGUAGE plpgsql;
@@ -35,7 +34,6 @@ AS
                 title = COALESCE(new_title, title),
                 description = COALESCE(new_desc, description)
             WHERE announcement_id = id;
-            COMMIT;
         END;
     $$
 LANGUAGE plpgsql;
@@ -55,7 +53,6 @@ AS
                 room = COALESCE(new_room, room),
                 time = COALESCE(new_time, time)
             WHERE appointment_id = id;
---             COMMIT;
         END;
     $$
 LANGUAGE plpgsql;
@@ -74,7 +74,7 @@ CREATE TABLE staff
 
 CREATE TABLE patient
 (
-    patient_id integer PRIMARY KEY,
+    patient_id integer GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
     email varchar(64) UNIQUE,
     username varchar(32) UNIQUE,
     password varchar(32) NOT NULL UNIQUE,
@@ -118,7 +118,7 @@ CREATE TABLE appointment_type
 
 CREATE TABLE appointment
 (
-    appointment_id integer PRIMARY KEY,
+    appointment_id integer GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
     type varchar(32) NOT NULL DEFAULT 'Unspecified',
     patient integer,
     doctor integer,
@@ -144,7 +144,7 @@ CREATE TABLE bill
 
 CREATE TABLE announcement
 (
-    announcement_id integer PRIMARY KEY,
+    announcement_id integer GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
     title varchar(128) NOT NULL,
     description text,
     author integer NOT NULL,
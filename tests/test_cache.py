@@ -0,0 +1,124 @@
+from bloodbank import cache as cache_module
+from bloodbank.cache import Cache
+
+
+def loader(calls):
+    def load(keys):
+        calls.append(list(keys))
+        return {key: f'value {key}' for key in keys}
+
+    return load
+
+
+def test_get_many_loads_only_misses():
+    cache, calls = Cache(), []
+    cache.get_many('staff', [1, 2], loader(calls))
+    found = cache.get_many('staff', [1, 2, 3], loader(calls))
+
+    assert found == {1: 'value 1', 2: 'value 2', 3: 'value 3'}
+    assert calls == [[1, 2], [3]]
+    assert (cache.hits, cache.misses) == (2, 3)
+
+
+def test_keys_left_out_by_the_loader_are_not_cached():
+    cache, calls = Cache(), []
+    cache.get_many('staff', [1, 2], lambda keys: calls.append(list(keys)) or {1: 'one'})
+    cache.get_many('staff', [1, 2], lambda keys: calls.append(list(keys)) or {})
+
+    assert calls == [[1, 2], [2]]
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache_module.time, 'monotonic', lambda: now[0])
+    cache, calls = Cache(ttl=10), []
+
+    cache.get('room', None, lambda: calls.append(1) or 'rooms')
+    now[0] += 5
+    cache.get('room', None, lambda: calls.append(2) or 'rooms')
+    now[0] += 10
+    cache.get('room', None, lambda: calls.append(3) or 'rooms')
+
+    assert calls == [1, 3]
+
+
+def test_lru_eviction_beyond_maxsize():
+    cache, calls = Cache(maxsize=2), []
+    cache.get_many('staff', [1, 2], loader(calls))
+    cache.get_many('staff', [1], loader(calls))
+    cache.get_many('staff', [3], loader(calls))
+    cache.get_many('staff', [1, 2], loader(calls))
+
+    assert calls == [[1, 2], [3], [2]]
+
+
+def test_invalidate_namespace_leaves_others():
+    cache, calls = Cache(), []
+    cache.get_many('staff', [1], loader(calls))
+    cache.get_many('patient', [1], loader(calls))
+
+    cache.invalidate('staff')
+    cache.get_many('staff', [1], loader(calls))
+    cache.get_many('patient', [1], loader(calls))
+
+    assert calls == [[1], [1], [1]]
+
+
+def test_invalidate_everything():
+    cache, calls = Cache(), []
+    cache.get_many('staff', [1], loader(calls))
+    cache.get_many('patient', [1], loader(calls))
+
+    cache.invalidate()
+    cache.get_many('staff', [1], loader(calls))
+    cache.get_many('patient', [1], loader(calls))
+
+    assert len(calls) == 4
+
+
+def test_invalidate_tag_drops_only_matching_keys():
+    cache, calls = Cache(), []
+    keys = [('2024-01-02', 1, None, 30), ('2024-01-03', 1, None, 30)]
+    cache.get_many('availability', keys, loader(calls))
+    cache.get('room', None, lambda: 'rooms')
+
+    cache.invalidate('availability', '2024-01-02')
+    cache.get_many('availability', keys, loader(calls))
+
+    assert calls == [keys, [keys[0]]]
+    assert ('room', None) in cache._entries
+
+
+def test_tag_invalidation_ignores_untagged_keys():
+    cache, calls = Cache(), []
+    cache.get_many('staff', [1], loader(calls))
+
+    cache.invalidate('staff', '1')
+
+    assert ('staff', 1) in cache._entries
+
+
+def test_invalidation_during_load_is_not_overwritten():
+    # The rows read by a load that overlaps an invalidation may predate the change, so they are returned but not kept
+    cache, calls = Cache(), []
+
+    def racing(keys):
+        calls.append(list(keys))
+        cache.invalidate('staff')
+        return {key: 'stale' for key in keys}
+
+    assert cache.get_many('staff', [1], racing) == {1: 'stale'}
+    assert cache.get_many('staff', [1], loader(calls)) == {1: 'value 1'}
+    assert calls == [[1], [1]]
+
+
+def test_full_invalidation_during_load_is_not_overwritten():
+    cache = Cache()
+
+    def racing(keys):
+        cache.invalidate()
+        return {key: 'stale' for key in keys}
+
+    cache.get_many('staff', [1], racing)
+
+    assert ('staff', 1) not in cache._entries
@@ -0,0 +1,38 @@
+import datetime
+
+import pytest
+
+from bloodbank.schedule import parse
+
+
+def test_parse_full_row():
+    rows = list(parse(['Blood test, 12, 3, 02-01-2024 09:30, 4, Fasting, 45']))
+
+    assert rows == [(1, 'Blood test', 12, 3, datetime.datetime(2024, 1, 2, 9, 30), 4, 'Fasting', '2700 seconds', None)]
+
+
+def test_parse_defaults():
+    # No minutes means the type's slot length, filled in the database; an empty doctor means the caller
+    rows = list(parse([', 12, , 02-01-2024 09:30, 4'], doctor=7))
+
+    assert rows == [(1, 'Unspecified', 12, 7, datetime.datetime(2024, 1, 2, 9, 30), 4, None, None, None)]
+
+
+def test_parse_skips_blank_and_comment_lines_but_keeps_numbering():
+    rows = list(parse(['# type, patient, doctor, time, room', '', 'Blood test, 1, 2, 02-01-2024 09:00, 3']))
+
+    assert [row[0] for row in rows] == [3]
+
+
+@pytest.mark.parametrize('line', [
+    'Blood test, x, 2, 02-01-2024 09:00, 3',
+    'Blood test, 1, 2, 2024-01-02 09:00, 3',
+    'Blood test, 1, 2, 02-01-2024 09:00',
+    'Blood test, 1, 2, 02-01-2024 09:00, 3, , 0',
+    'Blood test, 1, 2, 02-01-2024 09:00, 3, , -30',
+])
+def test_parse_reports_malformed_rows(line):
+    (row,) = parse([line])
+
+    assert row[0] == 1 and row[1:-1] == (None,) * 7
+    assert row[-1].startswith('malformed: ')
@@ -0,0 +1,61 @@
+import pytest
+
+from bloodbank.stats import BOUNDS, Histogram, QueryStats
+
+
+def test_empty_histogram():
+    assert Histogram().percentile(0.5) == 0.0
+
+
+def test_percentile_is_the_bucket_upper_bound():
+    histogram = Histogram()
+    for elapsed in [0.00004] * 90 + [0.0003] * 9 + [0.003]:
+        histogram.add(elapsed)
+
+    assert histogram.percentile(0.5) == BOUNDS[0]
+    assert histogram.percentile(0.95) == pytest.approx(0.0004)
+    assert histogram.percentile(0.99) == pytest.approx(0.0004)
+    assert histogram.percentile(1.0) == 0.003
+
+
+def test_percentile_never_exceeds_max():
+    histogram = Histogram()
+    histogram.add(0.0003)
+
+    assert histogram.percentile(0.5) == 0.0003
+
+
+def test_values_past_the_last_bound_report_max():
+    histogram = Histogram()
+    histogram.add(BOUNDS[-1] * 3)
+
+    assert histogram.percentile(0.99) == BOUNDS[-1] * 3
+
+
+def test_bucket_bounds_are_inclusive():
+    histogram = Histogram()
+    histogram.add(BOUNDS[3])
+
+    assert histogram.buckets[3] == 1
+
+
+def test_query_stats_keeps_one_histogram_per_command_and_statement():
+    stats = QueryStats()
+    stats.record('S_VIEW_LOGS', 'logs', 0.001)
+    stats.record('S_VIEW_LOGS', 'logs', 0.003)
+    stats.record('HELP', 'logs', 0.002)
+
+    snapshot = {(stat.command, stat.statement): stat for stat in stats.snapshot()}
+
+    assert snapshot[('S_VIEW_LOGS', 'logs')].calls == 2
+    assert snapshot[('S_VIEW_LOGS', 'logs')].max_ms == pytest.approx(3.0)
+    assert snapshot[('HELP', 'logs')].calls == 1
+
+
+def test_snapshot_is_ordered_by_total_time():
+    stats = QueryStats()
+    stats.record('a', 'fast', 0.001)
+    stats.record('a', 'slow', 0.5)
+
+    assert [stat.statement for stat in stats.snapshot()] == ['slow', 'fast']
+    assert stats.is_slow(0.5) and not stats.is_slow(0.001)
@@ -0,0 +1,98 @@
+import math
+
+import pytest
+
+from bloodbank import vitals
+
+NAN = float('nan')
+
+requires_numpy = pytest.mark.skipif(vitals.np is None, reason='bulk validation needs numpy')
+
+
+def test_parse_fills_missing_fields_with_nan():
+    rows, rejected = vitals.parse(['1, 70, 180, 3', '2, , 165', '# comment', 'x, 70'])
+
+    assert rows[0] == (1, 1, 70.0, 180.0, 3.0)
+    assert rows[1][:2] == (2, 2) and all(math.isnan(v) for v in (rows[1][2], rows[1][4]))
+    assert [line for line, _ in rejected] == [4]
+    assert rejected[0][1].startswith('malformed: ')
+
+
+@requires_numpy
+def test_validate_keeps_last_reading_per_patient():
+    valid, rejected = vitals.validate([
+        (1, 7, 70.0, 180.0, NAN),
+        (2, 8, 60.0, 170.0, NAN),
+        (3, 7, 72.0, 180.0, NAN),
+    ])
+
+    assert valid == [(2, 8, 60.0, 170.0, None), (3, 7, 72.0, 180.0, None)]
+    assert rejected == [(1, 'superseded by a later reading')]
+
+
+@requires_numpy
+def test_validate_rejected_reading_does_not_supersede():
+    valid, rejected = vitals.validate([
+        (1, 7, 70.0, 180.0, NAN),
+        (2, 7, 900.0, 180.0, NAN),
+    ])
+
+    assert valid == [(1, 7, 70.0, 180.0, None)]
+    assert rejected == [(2, vitals.WEIGHT_OUTSIDE)]
+
+
+@requires_numpy
+def test_validate_nan_means_not_given():
+    valid, rejected = vitals.validate([(1, 7, NAN, NAN, NAN), (2, 8, 70.0, NAN, 4.0)])
+
+    assert valid == [(1, 7, None, None, None), (2, 8, 70.0, None, 4)]
+    assert rejected == []
+
+
+@requires_numpy
+@pytest.mark.parametrize('row, reason', [
+    ((1, 0, 70.0, 180.0, NAN), vitals.UNKNOWN_PATIENT),
+    ((1, 7, 1.0, 180.0, NAN), vitals.WEIGHT_OUTSIDE),
+    ((1, 7, 70.0, 300.0, NAN), vitals.HEIGHT_OUTSIDE),
+    ((1, 7, 70.0, 180.0, 17.0), vitals.UNKNOWN_BLOOD),
+    ((1, 7, 70.0, 180.0, 2.5), vitals.UNKNOWN_BLOOD),
+    ((1, 7, 300.0, 150.0, NAN), vitals.BMI_OUTLIER),
+])
+def test_validate_reasons(row, reason):
+    assert vitals.validate([row]) == ([], [(1, reason)])
+
+
+@requires_numpy
+def test_validate_reports_first_failed_check():
+    assert vitals.validate([(1, 7, 1.0, 300.0, NAN)])[1] == [(1, vitals.WEIGHT_OUTSIDE)]
+
+
+@requires_numpy
+@pytest.mark.parametrize('weight, height, blood', [
+    (70.0, 180.0, 3),
+    (None, None, None),
+    (1.0, 180.0, None),
+    (70.0, 300.0, None),
+    (70.0, 180.0, 17),
+    (300.0, 150.0, None),
+    (1.0, 300.0, 17),
+])
+def test_check_matches_validate(weight, height, blood):
+    row = (1, 7, *(NAN if v is None else float(v) for v in (weight, height, blood)))
+    valid, rejected = vitals.validate([row])
+    reason = vitals.check(weight, height, blood)
+
+    assert rejected == ([] if reason is None else [(1, reason)])
+    assert bool(valid) == (reason is None)
+
+
+def test_check_without_numpy():
+    assert vitals.check(70.0, 180.0, 3) is None
+    assert vitals.check(None, 300.0, None) == vitals.HEIGHT_OUTSIDE
+
+
+def test_validate_without_numpy_is_a_reported_error(monkeypatch):
+    monkeypatch.setattr(vitals, 'np', None)
+
+    with pytest.raises(ValueError, match='numpy'):
+        vitals.validate([(1, 7, 70.0, 180.0, NAN)])